@@ -1,3 +1,5 @@
+import foodgram.constants as var
+from jobs.models import Job
 from recipes.models import (
     AmountIngredients,
     Favourite,
@@ -9,13 +11,49 @@ from recipes.models import (
 from users.models import Follow, Profile
 
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который для большой таблицы без фильтров берёт число
+    строк из статистики PostgreSQL (pg_class.reltuples), а не из
+    COUNT(*) по всей таблице. Оценка обновляется VACUUM/ANALYZE и
+    может немного отличаться от точного числа.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= var.ADMIN_ESTIMATED_COUNT_FROM:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка таблицы, в которой могут быть сотни тысяч строк."""
+
+    paginator = EstimatedCountPaginator
+    # без второго COUNT(*) по всей таблице для "Показать все"
+    show_full_result_count = False
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(LargeTableAdmin):
     list_display = ('first_name', 'email')
-    list_filter = list_display
+    list_filter = ('is_staff', 'is_active')
     search_fields = list_display
+    ordering = ('id',)
 
 
 @admin.register(Ingredient)
@@ -26,33 +64,72 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('name', 'slug', 'color')
+    search_fields = ('name', 'slug')
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ('name', 'author', 'display_tags', 'display_favourite')
-    list_filter = ('name', 'author', 'tags',)
+    list_filter = ('tags',)
+    list_select_related = ('author', 'score')
     search_fields = ('name',)
+    autocomplete_fields = ('author', 'tags')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('tags')
+
+    @admin.display(description='Теги')
+    def display_tags(self, obj):
+        return ', '.join(tag.name for tag in obj.tags.all())
+
+    @admin.display(description='Количество добавлений в избранное')
+    def display_favourite(self, obj):
+        # счётчик из RecipeScore, см. recipes.popularity
+        score = getattr(obj, 'score', None)
+        return score.favorites if score else 0
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
-    pass
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('user', 'following')
+    list_select_related = ('user', 'following')
+    search_fields = ('user__email', 'following__email')
+    autocomplete_fields = ('user', 'following')
 
 
 @admin.register(Favourite)
-class FavouriteAdmin(admin.ModelAdmin):
+class FavouriteAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe',)
-    list_filter = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingAdmin(admin.ModelAdmin):
-    pass
+class ShoppingAdmin(LargeTableAdmin):
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(AmountIngredients)
-class AmountAdmin(admin.ModelAdmin):
+class AmountAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'display_author',)
-    list_filter = ('recipe',)
+    list_select_related = ('recipe__author', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('ingredient',)
+    raw_id_fields = ('recipe',)
+
+    @admin.display(description='Автор рецепта')
+    def display_author(self, obj):
+        author = obj.recipe.author
+        return author.get_username() if author else None
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'worker')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
@@ -0,0 +1,319 @@
+"""
+Асинхронные обработчики чтения для ASGI-режима (настройка ASYNC_API).
+
+Django 3.2 не умеет асинхронно работать с ORM, поэтому каждый запрос
+к базе выполняется в отдельном потоке со своим подключением, а
+независимые запросы (страница, счётчик и загрузчики из
+api.representations) запускаются одновременно через asyncio.gather.
+
+Обрабатывается только "счастливый путь" GET-запросов. Всё остальное
+(запись, неверные параметры, ошибки авторизации, 404, ?format=)
+передаётся обычным вьюсетам, поэтому ответы совпадают с WSGI-режимом.
+"""
+import asyncio
+
+from api.filters import IngredientSearchFilter, RecipeFilter
+from api.renderers import FastJSONRenderer
+from api.representations import (
+    EXPAND_PARAM,
+    FIELDS_PARAM,
+    FOLLOW,
+    OMIT_PARAM,
+    RECIPE,
+    follow_loaders,
+    recipe_loaders
+)
+from api.serializers import IngredientSerializer, TagSerializer
+from api.views import IngredientViewSet, RecipesViewSet, TagViewSet
+from asgiref.sync import sync_to_async
+from foodgram.routers import read_from_replica, use_replica
+from recipes.models import Recipe
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from users.models import Follow, User
+from users.views import ProfileViewSet
+
+from django.core.paginator import InvalidPage
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+recipes_list = RecipesViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='Recipes', detail=False
+)
+recipes_detail = RecipesViewSet.as_view(
+    {'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='Recipes',
+    detail=True,
+)
+tags_list = TagViewSet.as_view(
+    {'get': 'list'}, basename='Tags', detail=False
+)
+ingredients_list = IngredientViewSet.as_view(
+    {'get': 'list'}, basename='Ingredients', detail=False
+)
+subscriptions_list = ProfileViewSet.as_view(
+    {'get': 'subscriptions'}, basename='Users', detail=False
+)
+
+
+def query(func, *args):
+    """Выполняет func в отдельном потоке со своим подключением к БД."""
+
+    def run():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def delegate(view, request, *args, **kwargs):
+    """Передаёт запрос синхронному вьюсету."""
+
+    return sync_to_async(view)(request, *args, **kwargs)
+
+
+def render(data):
+    return HttpResponse(
+        FastJSONRenderer().render(data), content_type='application/json'
+    )
+
+
+def async_view(fallback):
+    """
+    Оборачивает асинхронный обработчик: не-GET запросы и запросы, с
+    которыми обработчик не справился (вернул None), уходят в fallback.
+    """
+
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if (
+                request.method == 'GET'
+                and api_settings.URL_FORMAT_OVERRIDE not in request.GET
+            ):
+                with read_from_replica(use_replica(request)):
+                    response = await handler(request, *args, **kwargs)
+                if response is not None:
+                    return response
+            return await delegate(fallback, request, *args, **kwargs)
+
+        view.csrf_exempt = True
+        view.__name__ = handler.__name__
+        view.__doc__ = handler.__doc__
+        return view
+
+    return decorator
+
+
+def authenticate(request):
+    """
+    Возвращает DRF Request с уже определённым пользователем
+    или None, если аутентификация не прошла.
+    """
+
+    drf_request = Request(
+        request,
+        authenticators=[
+            auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    try:
+        drf_request.user
+    except APIException:
+        return None
+    return drf_request
+
+
+def representation(base, request):
+    """
+    Представление по ?fields=, ?omit= и ?expand= или None, если
+    параметры неверны (ошибку вернёт синхронный вьюсет).
+    """
+
+    try:
+        return base.from_query(request.GET)
+    except ValidationError:
+        return None
+
+
+async def gather(loaders, **context):
+    """Одновременно выполняет загрузчики и собирает контекст."""
+
+    results = await asyncio.gather(
+        *(query(loader) for loader in loaders.values())
+    )
+    context.update(zip(loaders, results))
+    return context
+
+
+@async_view(tags_list)
+async def tag_list(request):
+    """Список тегов."""
+
+    def fetch():
+        if authenticate(request) is None:
+            return None
+        return TagSerializer(TagViewSet.queryset.all(), many=True).data
+
+    data = await query(fetch)
+    return None if data is None else render(data)
+
+
+@async_view(ingredients_list)
+async def ingredient_list(request):
+    """Список ингредиентов с поиском по началу названия."""
+
+    def fetch():
+        drf_request = authenticate(request)
+        if drf_request is None:
+            return None
+        queryset = IngredientSearchFilter().filter_queryset(
+            drf_request, IngredientViewSet.queryset.all(), IngredientViewSet
+        )
+        return IngredientSerializer(queryset, many=True).data
+
+    data = await query(fetch)
+    return None if data is None else render(data)
+
+
+@async_view(recipes_list)
+async def recipe_list(request):
+    """
+    Список рецептов. Страница, общее количество и загрузчики
+    представления запрашиваются одновременно: загрузчики работают
+    с подзапросом по той же странице и не ждут её загрузки.
+    """
+
+    def prepare():
+        drf_request = authenticate(request)
+        if drf_request is None:
+            return None, None
+        filterset = RecipeFilter(
+            drf_request.query_params,
+            queryset=Recipe.objects.order_by('-id'),
+            request=drf_request,
+        )
+        if not filterset.is_valid():
+            return None, None
+        return drf_request, filterset.qs
+
+    if RecipesViewSet.batch_query_param in request.GET:
+        return None
+    recipe = representation(RECIPE, request)
+    if recipe is None:
+        return None
+    drf_request, queryset = await query(prepare)
+    if drf_request is None:
+        return None
+
+    pagination = RecipesViewSet.pagination_class()
+    page_size = pagination.get_page_size(drf_request)
+    number = drf_request.query_params.get(pagination.page_query_param, '1')
+    if not number.isdigit() or int(number) < 1:
+        return None
+    offset = (int(number) - 1) * page_size
+    page = queryset[offset:offset + page_size]
+    page_ids = page.values('id')
+    author_ids = Recipe.objects.filter(id__in=page_ids).values('author_id')
+
+    count, rows, context = await asyncio.gather(
+        query(queryset.count),
+        query(list, page.values(*recipe.columns)),
+        gather(
+            recipe.needed(
+                recipe_loaders(page_ids, author_ids, drf_request.user)
+            ),
+            request=drf_request,
+        ),
+    )
+
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    paginator.count = count
+    try:
+        pagination.page = paginator.page(number)
+    except InvalidPage:
+        return None
+    pagination.page.object_list = rows
+    pagination.request = drf_request
+    return render(
+        pagination.get_paginated_response(recipe.many(rows, context)).data
+    )
+
+
+@async_view(recipes_detail)
+async def recipe_detail(request, pk):
+    """
+    Рецепт. Сам рецепт и загрузчики представления не зависят друг
+    от друга и запрашиваются одновременно. Полный рецепт без параметров
+    отдаёт синхронная вьюха: он берётся из Recipe.representation и
+    поддерживает If-None-Match.
+    """
+
+    if not request.GET:
+        return None
+    if set(request.GET) - {FIELDS_PARAM, OMIT_PARAM, EXPAND_PARAM}:
+        # фильтры RecipeFilter применяются и к отдельному рецепту
+        return None
+    recipe = representation(RECIPE, request)
+    if recipe is None:
+        return None
+    drf_request = await query(authenticate, request)
+    if drf_request is None:
+        return None
+    author_ids = Recipe.objects.filter(id=pk).values('author_id')
+    rows, context = await asyncio.gather(
+        query(list, Recipe.objects.filter(id=pk).values(*recipe.columns)),
+        gather(
+            recipe.needed(recipe_loaders([pk], author_ids, drf_request.user)),
+            request=drf_request,
+        ),
+    )
+    if not rows:
+        return None
+    return render(recipe(rows[0], context))
+
+
+@async_view(subscriptions_list)
+async def subscriptions(request):
+    """
+    Подписки пользователя. Страница авторов и их число, а затем
+    загрузчики представления запрашиваются одновременно.
+    """
+
+    follow = representation(FOLLOW, request)
+    if follow is None:
+        return None
+    drf_request = await query(authenticate, request)
+    if drf_request is None or not drf_request.user.is_authenticated:
+        return None
+    limit = drf_request.query_params.get('recipes_limit')
+    if limit and not limit.isdigit():
+        return None
+    limit = int(limit) if limit else None
+
+    pagination = ProfileViewSet.pagination_class()
+    pagination.limit = pagination.get_limit(drf_request)
+    pagination.offset = pagination.get_offset(drf_request)
+    pagination.request = drf_request
+    queryset = User.objects.filter(
+        id__in=Follow.objects.filter(
+            user=drf_request.user
+        ).values_list('following'),
+        is_active=True,
+    )
+    page = queryset[pagination.offset:pagination.offset + pagination.limit]
+
+    # порядок подписок не задан, поэтому загрузчики получают id уже
+    # загруженной страницы, а не подзапрос по ней
+    pagination.count, rows = await asyncio.gather(
+        query(queryset.count),
+        query(list, page.values(*follow.columns)),
+    )
+    context = await gather(
+        follow.needed(follow_loaders([row['id'] for row in rows], limit))
+    )
+    return render(
+        pagination.get_paginated_response(follow.many(rows, context)).data
+    )
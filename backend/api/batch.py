@@ -0,0 +1,131 @@
+"""
+Мультиплексирование GET-запросов: /api/batch/ принимает список путей
+API и выполняет их внутри одного HTTP-запроса.
+
+Подзапросы не проходят заново через nginx и middleware: вьюха
+находится через resolve() и вызывается напрямую. Пользователь
+определяется один раз и передаётся подзапросам как уже
+аутентифицированный. Ответы DRF берутся до рендеринга (Response.data),
+поэтому JSON строится только один раз - для общего ответа.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import urlsplit
+
+import foodgram.constants as var
+from asgiref.sync import async_to_sync
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+API_PREFIX = '/api/'
+# заголовки тела исходного запроса подзапросам не передаются
+DROPPED_META = ('CONTENT_LENGTH', 'CONTENT_TYPE')
+
+logger = logging.getLogger(__name__)
+
+
+def error(path, code, detail):
+    return {'path': path, 'status': code, 'body': {'detail': detail}}
+
+
+def sub_request(request, path, query_string):
+    """GET-подзапрос с заголовками, cookies и пользователем исходного."""
+
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in DROPPED_META
+    }
+    sub.META.update(
+        REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query_string
+    )
+    sub.GET = QueryDict(query_string)
+    sub.COOKIES = request.COOKIES
+    # DRF не аутентифицирует запрос повторно, см. Request.__init__
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def body(response):
+    if isinstance(response, Response):
+        return response.data
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content)
+    return response.content.decode(response.charset)
+
+
+def dispatch(request, path):
+    """Выполняет один подзапрос и возвращает его статус и тело."""
+
+    url = urlsplit(path)
+    if url.scheme or url.netloc or not url.path.startswith(API_PREFIX):
+        return error(path, status.HTTP_400_BAD_REQUEST, (
+            f'Путь должен начинаться с {API_PREFIX}.'
+        ))
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return error(path, status.HTTP_404_NOT_FOUND, 'Страница не найдена.')
+    if getattr(match.func, 'view_class', None) is BatchView:
+        return error(path, status.HTTP_400_BAD_REQUEST, (
+            'Вложенные пакетные запросы не поддерживаются.'
+        ))
+
+    sub = sub_request(request, url.path, url.query)
+    sub.resolver_match = match
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+    except Http404:
+        return error(path, status.HTTP_404_NOT_FOUND, 'Страница не найдена.')
+    except Exception:
+        # ошибка одного подзапроса не должна ронять весь пакет
+        logger.exception('Ошибка в подзапросе %s', path)
+        return error(
+            path, status.HTTP_500_INTERNAL_SERVER_ERROR, 'Ошибка сервера.'
+        )
+    return {
+        'path': path, 'status': response.status_code, 'body': body(response)
+    }
+
+
+class BatchView(APIView):
+    """
+    POST {"requests": ["/api/users/me/", "/api/tags/", ...]} возвращает
+    {"responses": [{"path", "status", "body"}, ...]} в том же порядке.
+    Поддерживаются только GET-запросы к API, не больше
+    BATCH_MAX_REQUESTS за раз и без вложенных пакетов.
+    """
+
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        paths = (
+            request.data.get('requests')
+            if isinstance(request.data, dict) else None
+        )
+        if not isinstance(paths, list) or not all(
+            isinstance(path, str) for path in paths
+        ):
+            raise ValidationError(
+                {'requests': ['Ожидается список путей API.']}
+            )
+        if len(paths) > var.BATCH_MAX_REQUESTS:
+            raise ValidationError({'requests': [
+                f'Не больше {var.BATCH_MAX_REQUESTS} запросов за раз.'
+            ]})
+        return Response({
+            'responses': [dispatch(request, path) for path in paths]
+        })
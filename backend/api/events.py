@@ -0,0 +1,150 @@
+"""
+Поток событий /api/events/ (Server-Sent Events) для ASGI-приложения.
+
+Подписчик получает событие recipe о каждом новом рецепте авторов, на
+которых он подписан (см. recipes.signals), вместо периодического опроса
+списков рецептов и подписок. Браузерный EventSource не умеет
+передавать заголовки, поэтому токен можно указать и в ?token=.
+
+Раз в EVENTS_HEARTBEAT_SECONDS отправляется комментарий-пинг, чтобы
+прокси не закрывали соединение. Если клиент не успевает читать и
+очередь подписки переполнилась, отправляется событие overflow и поток
+закрывается: пропущенное клиент догоняет через /api/sync/.
+
+Список авторов фиксируется при подключении; после новой подписки
+клиенту нужно переподключиться.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from api.async_views import query
+from foodgram.events import get_broker
+from recipes.signals import author_channel
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from users.models import Follow
+
+from django.conf import settings
+
+EVENTS_PATH = '/api/events/'
+# клиент переподключается через 5 секунд после обрыва
+RETRY_MS = 5000
+
+
+def authenticate(key):
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def followed_authors(user):
+    return list(
+        Follow.objects.filter(user=user).values_list('following_id', flat=True)
+    )
+
+
+def credentials(scope):
+    """Токен из заголовка Authorization: Token <key> или из ?token=."""
+
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            parts = value.decode('latin1').split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    query_params = parse_qs(scope['query_string'].decode('latin1'))
+    return query_params.get('token', [None])[0]
+
+
+def sse(event, data, id=None):
+    lines = [f'id: {id}'] if id is not None else []
+    lines += [
+        f'event: {event}',
+        f'data: {json.dumps(data, ensure_ascii=False)}',
+    ]
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def respond(send, status, detail):
+    body = json.dumps({'detail': detail}, ensure_ascii=False).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream(scope, receive, send):
+    """ASGI-приложение потока событий."""
+
+    if scope['method'] != 'GET':
+        return await respond(send, 405, 'Метод не разрешен.')
+    key = credentials(scope)
+    user = await query(authenticate, key) if key else None
+    if user is None:
+        return await respond(
+            send, 401, 'Учетные данные не были предоставлены.'
+        )
+    authors = await query(followed_authors, user)
+
+    subscription = get_broker().subscribe(map(author_channel, authors))
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    getter = None
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                # nginx не должен буферизовать поток
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+        while True:
+            if subscription.overflowed:
+                await send({
+                    'type': 'http.response.body',
+                    'body': sse('overflow', {}),
+                })
+                return
+            if getter is None:
+                getter = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                (getter, disconnected),
+                timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                return
+            if getter in done:
+                recipe = getter.result()
+                getter = None
+                chunk = sse('recipe', recipe, id=recipe['id'])
+            else:
+                chunk = b': ping\n\n'
+            # send ждёт, пока клиент примет данные: медленный клиент
+            # не читает очередь, и она переполняется
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': True,
+            })
+    finally:
+        subscription.close()
+        for task in (getter, disconnected):
+            if task is not None:
+                task.cancel()
@@ -2,18 +2,25 @@ from django_filters import rest_framework as filter
 from recipes.models import Recipe, Tag
 from rest_framework.filters import SearchFilter
 
+from django.db.models import Exists, OuterRef
+
 
 class IngredientSearchFilter(SearchFilter):
     search_param = 'name'
 
 
+def tag_choices():
+    return [(slug, slug) for slug in Tag.objects.slug_ids()]
+
+
 class RecipeFilter(filter.FilterSet):
     author = filter.CharFilter()
-    tags = filter.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
+    # slug проверяются по словарю в памяти, а рецепты отбираются
+    # через EXISTS: JOIN с тегами размножил бы строки и потребовал DISTINCT
+    tags = filter.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags',
         label='Tags',
-        to_field_name='slug',
     )
     is_favorited = filter.BooleanFilter(method='get_favorite')
     is_in_shopping_cart = filter.BooleanFilter(
@@ -23,6 +30,15 @@ class RecipeFilter(filter.FilterSet):
         model = Recipe
         fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
 
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        slug_ids = Tag.objects.slug_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[slug_ids[slug] for slug in value if slug in slug_ids],
+        )))
+
     def get_favorite(self, queryset, name, value):
         if value:
             return queryset.filter(favorites__user_id=self.request.user.id)
@@ -0,0 +1,107 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+)
+
+
+def process_rss(pid):
+    """Память (RSS, байты) процесса и всех его потомков по данным /proc."""
+
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except OSError:
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер GET-запросами и выводит пропускную '
+        'способность, задержки и память воркеров. Запустите отдельно для '
+        'WSGI и для ASGI (ASYNC_API=True) с одинаковой памятью воркеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--token', help='токен пользователя')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--pid', type=int, help='pid мастера gunicorn')
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        deadline = time.monotonic() + options['duration']
+        paths = options['paths']
+
+        def worker(number):
+            latencies, errors, i = [], 0, number
+            while time.monotonic() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                start = time.monotonic()
+                try:
+                    with urlopen(
+                        Request(options['url'] + path, headers=headers)
+                    ) as response:
+                        response.read()
+                except (URLError, OSError):
+                    errors += 1
+                    continue
+                latencies.append(time.monotonic() - start)
+            return latencies, errors
+
+        rss = process_rss(options['pid']) if options['pid'] else None
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(
+                executor.map(worker, range(options['concurrency']))
+            )
+        if options['pid']:
+            rss = max(rss, process_rss(options['pid']))
+
+        latencies = sorted(t for result, _ in results for t in result)
+        errors = sum(count for _, count in results)
+        rps = len(latencies) / options['duration']
+        print(f'Запросов: {len(latencies)}, ошибок: {errors}')
+        print(f'Пропускная способность: {rps:.1f} запр./с')
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(
+                f'Задержка, мс: p50={quantiles[49] * 1000:.1f} '
+                f'p95={quantiles[94] * 1000:.1f} '
+                f'p99={quantiles[98] * 1000:.1f}'
+            )
+        if rss:
+            print(
+                f'Память воркеров: {rss / 2 ** 20:.0f} МБ, '
+                f'{rps / (rss / 2 ** 30):.1f} запр./с на ГБ'
+            )
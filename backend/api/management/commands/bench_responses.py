@@ -0,0 +1,79 @@
+import gzip
+import time
+
+from api.renderers import FastJSONRenderer
+from foodgram.compression import brotli
+from rest_framework.renderers import JSONRenderer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/recipes/',
+    '/api/recipes/?limit=50',
+    '/api/users/',
+)
+
+
+def best_time(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время рендеринга JSON (JSONRenderer и FastJSONRenderer), '
+        'размер ответов без сжатия, с gzip и brotli и время сжатия для '
+        'основных эндпоинтов по данным текущей базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='localhost')
+        repeat = options['repeat']
+        for path in options['paths']:
+            response = client.get(path)
+            data = getattr(response, 'data', None)
+            if response.status_code != 200 or data is None:
+                print(f'{path}: ответ {response.status_code}, пропущен')
+                continue
+
+            stdlib, content = best_time(
+                repeat, lambda: JSONRenderer().render(data)
+            )
+            fast, fast_content = best_time(
+                repeat, lambda: FastJSONRenderer().render(data)
+            )
+            line = [
+                f'{path}: {len(content)} байт',
+                f'JSONRenderer {stdlib:.2f} мс',
+                f'FastJSONRenderer {fast:.2f} мс'
+                + ('' if fast_content == content else ' (ответ отличается)'),
+            ]
+            gzip_time, compressed = best_time(
+                repeat,
+                lambda: gzip.compress(
+                    content, compresslevel=settings.COMPRESSION_GZIP_LEVEL
+                ),
+            )
+            line.append(f'gzip {len(compressed)} байт за {gzip_time:.2f} мс')
+            if brotli is not None:
+                br_time, compressed = best_time(
+                    repeat,
+                    lambda: brotli.compress(
+                        content, quality=settings.COMPRESSION_BROTLI_QUALITY
+                    ),
+                )
+                line.append(f'br {len(compressed)} байт за {br_time:.2f} мс')
+            print(', '.join(line))
@@ -0,0 +1,123 @@
+import time
+
+from api.representations import RECIPE_FIELDS, recipes_data
+from api.serializers import RecipesSerializer
+from recipes.models import AmountIngredients, Ingredient, Recipe, Tag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость сериализации списка рецептов через '
+        'RecipesSerializer и через api.representations. Тестовые '
+        'рецепты создаются в транзакции, которая затем откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['count'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        author = User.objects.create_user(
+            email='bench@foodgram.ru',
+            username='bench',
+            first_name='bench',
+            last_name='bench',
+        )
+        tags = [
+            Tag.objects.create(name=f'bench-{i}', slug=f'bench-{i}')
+            for i in range(3)
+        ]
+        # не все СУБД возвращают id из bulk_create, поэтому объекты
+        # перечитываются из базы
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench-{i}', measurement_unit='г')
+            for i in range(5)
+        )
+        ingredients = Ingredient.objects.filter(name__startswith='bench-')
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'bench-{i}',
+                text='bench',
+                cooking_time=i + 1,
+                author=author,
+                image='recipes/images/temp.png',
+            )
+            for i in range(count)
+        )
+        recipes = Recipe.objects.filter(author=author)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags[:2]
+        )
+        AmountIngredients.objects.bulk_create(
+            AmountIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients
+        )
+        return author
+
+    def measure(self, name, count, repeat, func):
+        best, size = None, 0
+        for _ in range(repeat):
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                start = time.perf_counter()
+                data = func()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            size = len(JSONRenderer().render(data))
+        print(
+            f'{name}: {best * 1000 / count * 1000:.1f} мс на 1000 рецептов, '
+            f'{queries.count} запросов, {size} байт JSON'
+        )
+        return data
+
+    def run(self, count, repeat):
+        author = self.seed(count)
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = author
+        queryset = Recipe.objects.filter(author=author).order_by('-id')
+
+        drf = self.measure(
+            'RecipesSerializer', count, repeat,
+            lambda: RecipesSerializer(
+                queryset.select_related('author').prefetch_related(
+                    'ingredients', 'tags'
+                ),
+                many=True,
+                context={'request': request},
+            ).data,
+        )
+        fast = self.measure(
+            'api.representations', count, repeat,
+            lambda: recipes_data(request, queryset.values(*RECIPE_FIELDS)),
+        )
+        same = JSONRenderer().render(drf) == JSONRenderer().render(fast)
+        print('Ответы совпадают' if same else 'Ответы РАЗЛИЧАЮТСЯ')
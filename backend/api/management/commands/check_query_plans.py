@@ -0,0 +1,349 @@
+"""
+Проверка планов основных запросов API.
+
+Команда создаёт небольшой набор данных в транзакции, которая затем
+откатывается, выполняет EXPLAIN для главного запроса каждой страницы
+и падает, если план не такой, как ожидается:
+    tables  - таблицы, которые должны читаться по индексу, а не
+              последовательным просмотром;
+    indexes - индексы, которые план должен использовать;
+    ordered - порядок строк должен давать индекс, без сортировки.
+
+На PostgreSQL последовательный просмотр и сортировка запрещаются
+планировщику (enable_seqscan, enable_sort): если они всё равно есть в
+плане, подходящего индекса нет, и размер тестовых данных не важен.
+На SQLite проверяются только таблицы: его планировщик не переносит
+порядок через равенство в JOIN и выбирает индексы иначе.
+"""
+import json
+import re
+from dataclasses import dataclass
+
+from recipes.models import (
+    AmountIngredients,
+    Favourite,
+    Ingredient,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+    Tag
+)
+from sync.models import Change
+from users.models import Follow, User
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+
+# строка EXPLAIN QUERY PLAN SQLite для полного просмотра таблицы
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+# псевдонимы таблиц в подзапросах: "recipes_recipe_tags" U0
+SQL_ALIAS = re.compile(r'"(\w+)" (U\d+)')
+
+
+@dataclass
+class Check:
+    name: str
+    query: object
+    tables: tuple = ()
+    indexes: tuple = ()
+    ordered: bool = False
+
+
+def checks(data):
+    """Главные запросы страниц API для данных <data> из seed()."""
+
+    user, author, ids = data['user'], data['author'], data['recipe_ids']
+    through = Recipe.tags.through
+    return [
+        Check(
+            '/recipes/',
+            lambda: Recipe.objects.order_by('-id').values('id')[:6],
+            ordered=True,
+        ),
+        Check(
+            '/recipes/?author=',
+            lambda: Recipe.objects.filter(author=author).order_by(
+                '-id'
+            ).values('id')[:6],
+            tables=('recipes_recipe',),
+            indexes=('recipes_author_newest',),
+            ordered=True,
+        ),
+        Check(
+            '/recipes/?is_favorited=1',
+            lambda: Recipe.objects.filter(favorites__user=user).order_by(
+                '-id'
+            ).values('id')[:6],
+            tables=('recipes_favourite',),
+            ordered=True,
+        ),
+        Check(
+            '/recipes/?is_in_shopping_cart=1',
+            lambda: Recipe.objects.filter(shopping__user=user).order_by(
+                '-id'
+            ).values('id')[:6],
+            tables=('recipes_shoppingcart',),
+            ordered=True,
+        ),
+        Check(
+            '/recipes/?tags=',
+            lambda: Recipe.objects.filter(Exists(through.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=data['tag_ids']
+            ))).order_by('-id').values('id')[:6],
+            tables=(through._meta.db_table,),
+            ordered=True,
+        ),
+        Check(
+            '/recipes/popular/',
+            lambda: Recipe.objects.filter(score__total__gt=0).order_by(
+                '-score__trending', '-id'
+            ).values('id')[:6],
+            tables=('recipes_recipescore', 'recipes_recipe'),
+            indexes=('recipes_score_trending',),
+            ordered=True,
+        ),
+        Check(
+            '/recipes/<id>/',
+            lambda: Recipe.objects.filter(id=ids[0]).values('id', 'version'),
+            tables=('recipes_recipe',),
+        ),
+        Check(
+            'теги рецептов',
+            lambda: Tag.objects.filter(recipes__in=ids).values(
+                'id', recipe_id=F('recipes__id')
+            ),
+            tables=(through._meta.db_table,),
+        ),
+        Check(
+            'ингредиенты рецептов',
+            lambda: Ingredient.objects.filter(recipes__in=ids).order_by(
+                'recipe__recipe_id', 'recipe__id'
+            ).values('id', 'name', amount=F('recipe__amount')),
+            tables=('recipes_amountingredients', 'recipes_ingredient'),
+            indexes=('recipes_amount_covering',),
+            ordered=True,
+        ),
+        Check(
+            'is_favorited',
+            lambda: Favourite.objects.filter(
+                recipe__in=ids, user=user
+            ).values('recipe_id'),
+            tables=('recipes_favourite',),
+        ),
+        Check(
+            'is_in_shopping_cart',
+            lambda: ShoppingCart.objects.filter(
+                recipe__in=ids, user=user
+            ).values('recipe_id'),
+            tables=('recipes_shoppingcart',),
+        ),
+        Check(
+            'is_subscribed',
+            lambda: Follow.objects.filter(
+                following__in=[author.id], user=user
+            ).values('following_id'),
+            tables=('users_follow',),
+        ),
+        Check(
+            '/users/subscriptions/',
+            lambda: User.objects.filter(id__in=Follow.objects.filter(
+                user=user
+            ).values('following_id')).values('id')[:6],
+            tables=('users_follow',),
+        ),
+        Check(
+            'рецепты авторов подписок',
+            lambda: Recipe.objects.filter(author__in=[author.id]).order_by(
+                '-id'
+            ).values('author_id', 'id'),
+            tables=('recipes_recipe',),
+            indexes=('recipes_author_newest',),
+        ),
+        Check(
+            'подписчики автора',
+            lambda: Follow.objects.filter(following=author).values('user_id'),
+            tables=('users_follow',),
+        ),
+        Check(
+            '/recipes/download_shopping_cart/',
+            lambda: AmountIngredients.objects.filter(
+                recipe__shopping__user=user
+            ).values('ingredient__name').annotate(amount=Sum('amount')),
+            tables=('recipes_shoppingcart', 'recipes_amountingredients'),
+        ),
+        Check(
+            '/sync/',
+            lambda: Change.objects.visible_to(user).filter(
+                id__gt=0
+            ).order_by('id').values('id')[:100],
+            tables=('sync_change',),
+            ordered=True,
+        ),
+    ]
+
+
+def seed():
+    """Небольшой набор данных, на котором выполняются запросы."""
+
+    # bulk_create не возвращает id на SQLite, а они нужны дальше
+    users = [
+        User.objects.create(
+            email=f'plan{number}@example.com',
+            username=f'plan{number}',
+            first_name='План',
+            last_name='Проверка',
+        )
+        for number in range(5)
+    ]
+    user, author = users[0], users[1]
+    tags = [
+        Tag.objects.create(name=f'План {number}', slug=f'plan-{number}')
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'План {number}', measurement_unit='г'
+        )
+        for number in range(10)
+    ]
+    recipes = [
+        Recipe.objects.create(
+            author=users[number % len(users)],
+            name=f'План {number}',
+            text='Проверка планов',
+            cooking_time=number + 1,
+            image='recipes/images/plan.png',
+        )
+        for number in range(20)
+    ]
+    for number, recipe in enumerate(recipes):
+        recipe.tags.add(tags[number % len(tags)])
+    AmountIngredients.objects.bulk_create(
+        AmountIngredients(
+            recipe=recipe,
+            ingredient=ingredients[(number + shift) % len(ingredients)],
+            amount=shift + 1,
+        )
+        for number, recipe in enumerate(recipes)
+        for shift in range(3)
+    )
+    Favourite.objects.bulk_create(
+        Favourite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    RecipeScore.objects.bulk_create(
+        RecipeScore(recipe=recipe, total=1, trending=1.0)
+        for recipe in recipes[::2]
+    )
+    Follow.objects.bulk_create(
+        Follow(user=user, following=other) for other in users[1:]
+    )
+    return {
+        'user': user,
+        'author': author,
+        'recipe_ids': [recipe.id for recipe in recipes[:6]],
+        'tag_ids': [tags[0].id],
+    }
+
+
+def postgresql_problems(check, plan, sql):
+    nodes, stack = [], [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get('Plans', ()))
+    problems = [
+        f'последовательный просмотр {node["Relation Name"]}'
+        for node in nodes
+        if node['Node Type'] == 'Seq Scan'
+        and node['Relation Name'] in check.tables
+    ]
+    used = {node.get('Index Name') for node in nodes}
+    problems.extend(
+        f'не используется индекс {index}'
+        for index in check.indexes if index not in used
+    )
+    if check.ordered and any(
+        node['Node Type'] in ('Sort', 'Incremental Sort') for node in nodes
+    ):
+        problems.append('сортировка вместо порядка индекса')
+    return problems
+
+
+def sqlite_problems(check, plan, sql):
+    aliases = {alias: table for table, alias in SQL_ALIAS.findall(sql)}
+    problems = []
+    for *_, detail in plan:
+        match = SQLITE_SCAN.match(detail)
+        if match is None:
+            continue
+        table = aliases.get(match.group(1), match.group(1))
+        if table in check.tables:
+            problems.append(f'последовательный просмотр {table}')
+    return problems
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return cursor.fetchall()
+
+
+def format_plan(plan):
+    if connection.vendor == 'postgresql':
+        return json.dumps(plan, ensure_ascii=False, indent=2)
+    return '\n'.join(row[-1] for row in plan)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для главных запросов API на тестовых данных '
+        'и завершается с ошибкой, если вместо индекса в плане '
+        'последовательный просмотр или сортировка. Данные создаются в '
+        'транзакции и откатываются.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(
+                f'СУБД {connection.vendor} не поддерживается.'
+            )
+        problems = self.check_plans(options['verbosity'])
+        if problems:
+            raise CommandError(
+                f'Планы не соответствуют ожиданиям: {len(problems)}.'
+            )
+        print('Все планы соответствуют ожиданиям.')
+
+    def check_plans(self, verbosity):
+        failed = []
+        with transaction.atomic():
+            data = seed()
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('SET LOCAL enable_sort = off')
+                find_problems = postgresql_problems
+            else:
+                find_problems = sqlite_problems
+            for check in checks(data):
+                sql, params = check.query().query.sql_with_params()
+                plan = explain(sql, params)
+                problems = find_problems(check, plan, sql)
+                status = 'ОШИБКА' if problems else 'ок'
+                print(f'{status:6} {check.name}')
+                for problem in problems:
+                    print(f'       {problem}')
+                if problems or verbosity > 1:
+                    print(format_plan(plan))
+                failed.extend(problems)
+            transaction.set_rollback(True)
+        return failed
@@ -0,0 +1,476 @@
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_COLLECTION = (
+    settings.BASE_DIR.parent / 'postman-collection'
+    / 'diploma.postman_collection.json'
+)
+# запросы, которые каждый виртуальный пользователь выполняет до замера:
+# свои пользователи, токены, id тегов и ингредиентов и рецепт
+SETUP = (
+    'create_first_user',
+    'create_second_user',
+    'create_third_user',
+    'get_token_for_first_user',
+    'get_token_for_second_user',
+    'get_tag_list // User',
+    'get_ingredients_list // User',
+    'create_first_recipe // Second User',
+)
+# сценарий: вес и запросы коллекции, которые выполняются по порядку
+SCENARIOS = {
+    'browse': (50, (
+        'get_recipes_list // No Auth',
+        'get_recipe_detail // No Auth',
+        'get_tag_list // No Auth',
+        'get_ingredient // No Auth',
+    )),
+    'feed': (20, (
+        'get_recipes_list // User',
+        'get_recipes_list_with_two_tags_param // User',
+        'get_recipe_detail // User',
+        'users_me // User',
+    )),
+    'search': (10, (
+        'get_ingredients_list_with_name_filter // User',
+        'get_recipes_list_with_author_param // User',
+    )),
+    'favorite': (8, (
+        'add_to_favorite // User',
+        'get_recipes_list_with_is_favorited_param // User',
+        'remove_from_favorite // User',
+    )),
+    'shopping': (6, (
+        'add_to_shopping_cart // User',
+        'download_shopping_cart // User',
+        'remove_from_shopping_cart // User',
+    )),
+    'subscribe': (4, (
+        'create_subscription // User',
+        'get_subscription_list_with_recipes_limit_param // User',
+        'delete_first_subscription // User',
+    )),
+    'publish': (2, (
+        'create_fifth_recipe // User',
+        'update_recipe // Second User',
+        'delete_fifth_recipe // Second User',
+    )),
+}
+# у каждого виртуального пользователя свои пользователи API
+USER_VARIABLES = {
+    'email': '"{prefix}-1@example.org"',
+    'username': '"{prefix}-1"',
+    'secondUserEmail': '"{prefix}-2@example.org"',
+    'secondUserUsername': '"{prefix}-2"',
+    'thirdUserEmail': '"{prefix}-3@example.org"',
+    'thirdUserUsername': '"{prefix}-3"',
+}
+VARIABLE_RE = re.compile(r'{{(\w+)}}')
+# const userId = _.get(responseData, "id");
+GET_RE = re.compile(r'const (\w+) = _\.get\(responseData, "(\w+)"\)')
+# pm.collectionVariables.set("firstTagId", responseData[0].id);
+SET_RE = re.compile(
+    r'collectionVariables\.set\(["\'](\w+)["\'],\s*(.+?)\);?$'
+)
+ITEM_RE = re.compile(
+    r'responseData\[(\d+)\]\.(\w+)(?:\.slice\(0,\s*(\d+)\))?$'
+)
+STATUS_RE = re.compile(r'\.to\.be\.eql\("([A-Za-z ]+)"\)')
+STATUS_CODES = {status.phrase: status.value for status in HTTPStatus}
+
+
+class Step:
+    """Запрос коллекции: шаблон, ожидаемый статус и переменные ответа."""
+
+    def __init__(self, item, auth):
+        request = item['request']
+        self.name = item['name']
+        self.method = request['method']
+        self.url = request['url']['raw']
+        self.headers = {
+            header['key']: header['value']
+            for header in request.get('header', [])
+            if not header.get('disabled')
+        }
+        auth = request.get('auth', auth)
+        if auth and auth['type'] == 'apikey':
+            apikey = {field['key']: field['value'] for field in auth['apikey']}
+            self.headers[apikey['key']] = apikey['value']
+        self.body = (request.get('body') or {}).get('raw') or None
+        if self.body is not None:
+            self.headers.setdefault('Content-Type', 'application/json')
+
+        script = '\n'.join(
+            line for event in item.get('event', ())
+            if event['listen'] == 'test'
+            for line in event['script']['exec']
+        )
+        expected = STATUS_RE.search(script)
+        self.expected = expected and STATUS_CODES.get(expected.group(1))
+        fields = dict(GET_RE.findall(script))
+        # переменная -> (индекс в списке или None, поле, длина среза)
+        self.extract = {}
+        for line in script.splitlines():
+            found = SET_RE.search(line.strip())
+            if found is None:
+                continue
+            variable, expression = found.groups()
+            if expression in fields:
+                self.extract[variable] = (None, fields[expression], None)
+            elif ITEM_RE.match(expression):
+                index, field, length = ITEM_RE.match(expression).groups()
+                self.extract[variable] = (
+                    int(index), field, length and int(length)
+                )
+
+    def render(self, template, variables):
+        def value(match):
+            if match.group(1) not in variables:
+                raise KeyError(f'нет переменной {match.group(1)}')
+            return str(variables[match.group(1)])
+
+        return VARIABLE_RE.sub(value, template)
+
+    def save_variables(self, body, variables):
+        if not self.extract:
+            return
+        data = json.loads(body)
+        for variable, (index, field, length) in self.extract.items():
+            value = (data if index is None else data[index])[field]
+            variables[variable] = value[:length] if length else value
+
+
+def load_collection(path):
+    """Запросы коллекции по имени, авторизация наследуется от папок."""
+
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    steps = {}
+
+    def walk(items, auth):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'], item.get('auth', auth))
+            else:
+                # у повторяющихся имён берётся первый запрос
+                steps.setdefault(item['name'], Step(item, auth))
+
+    walk(collection['item'], collection.get('auth'))
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return steps, variables
+
+
+class Connection:
+    """Соединение HTTP/1.1 с keep-alive поверх asyncio."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, target, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        body = body.encode() if body is not None else b''
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+        )
+        try:
+            return await self.response()
+        except BaseException:
+            self.close()
+            raise
+
+    async def response(self):
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunks.append(await self.reader.readexactly(size + 2))
+                if not size:
+                    break
+            body = b''.join(chunk[:-2] for chunk in chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(
+                int(headers['content-length'])
+            )
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class VirtualUser:
+    """Пользователь нагрузки: свои переменные, соединение и сценарии."""
+
+    def __init__(self, steps, variables, url, timeout, stats):
+        self.steps = steps
+        self.variables = variables
+        self.timeout = timeout
+        self.stats = stats
+        url = urlsplit(url)
+        self.connection = Connection(url.hostname, url.port or 80)
+
+    async def run_step(self, name, record=True):
+        step = self.steps[name]
+        started = time.perf_counter()
+        try:
+            target = urlsplit(step.render(step.url, self.variables))
+            status, body = await asyncio.wait_for(
+                self.connection.request(
+                    step.method,
+                    target.path + (f'?{target.query}' if target.query else ''),
+                    {
+                        key: step.render(value, self.variables)
+                        for key, value in step.headers.items()
+                    },
+                    step.body and step.render(step.body, self.variables),
+                ),
+                self.timeout,
+            )
+        except (KeyError, OSError, ValueError, IndexError,
+                asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+            status, body = type(error).__name__, b''
+        duration = time.perf_counter() - started
+        ok = status == step.expected if step.expected else (
+            isinstance(status, int) and status < 400
+        )
+        if ok:
+            try:
+                step.save_variables(body, self.variables)
+            except (KeyError, IndexError, TypeError, ValueError):
+                ok, status = False, 'нет данных в ответе'
+        if record:
+            self.stats[name]['latencies'].append(duration)
+            if not ok:
+                self.stats[name]['errors'][status] += 1
+        return ok, status
+
+    async def setup(self):
+        for name in SETUP:
+            ok, status = await self.run_step(name, record=False)
+            if not ok:
+                raise CommandError(f'Подготовка: {name} вернул {status}.')
+
+    async def run(self, scenarios, weights, rng, deadline, think_time):
+        while time.monotonic() < deadline:
+            for name in rng.choices(scenarios, weights)[0]:
+                if time.monotonic() >= deadline:
+                    break
+                await self.run_step(name)
+                if think_time:
+                    await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        self.connection.close()
+
+
+def summarize(stats, duration):
+    result = {}
+    for name, data in sorted(stats.items()):
+        latencies = data['latencies']
+        # для quantiles нужно хотя бы два значения; inclusive не выходит
+        # за пределы замеров
+        quantiles = [
+            seconds * 1000 for seconds in (
+                statistics.quantiles(latencies, n=100, method='inclusive')
+                if len(latencies) > 1 else latencies * 99
+            )
+        ]
+        errors = sum(data['errors'].values())
+        result[name] = {
+            'requests': len(latencies),
+            'rps': len(latencies) / duration,
+            'errors': errors,
+            'error_rate': errors / len(latencies),
+            'p50': quantiles[49],
+            'p95': quantiles[94],
+            'p99': quantiles[98],
+            'max': max(latencies) * 1000,
+            'error_statuses': {
+                str(status): count
+                for status, count in data['errors'].most_common()
+            },
+        }
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест по postman-коллекции: виртуальные пользователи '
+        'выполняют взвешенные сценарии из запросов коллекции (SCENARIOS) '
+        'против запущенного сервера и выводят пропускную способность, '
+        'задержки и долю ошибок по каждому запросу. Ошибка - статус, '
+        'отличный от ожидаемого в тестах коллекции. Чтобы сравнить две '
+        'сборки, сохраните результат одной (--save) и запустите вторую с '
+        '--compare и теми же --users, --duration и --seed. Для рецептов '
+        'в базе нужны минимум 2 ингредиента и 3 тега; каждый запуск '
+        'создаёт своих пользователей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--collection', default=str(DEFAULT_COLLECTION))
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--think-time',
+            type=float,
+            default=0,
+            help='Средняя пауза пользователя между запросами, секунды.',
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--weight',
+            nargs='+',
+            default=(),
+            metavar='СЦЕНАРИЙ=ВЕС',
+            help=f'Изменить веса сценариев: {", ".join(SCENARIOS)}.',
+        )
+        parser.add_argument('--save', help='сохранить результат в JSON')
+        parser.add_argument('--compare', help='сравнить с сохранённым')
+
+    def handle(self, *args, **options):
+        steps, variables = load_collection(options['collection'])
+        weights = {name: weight for name, (weight, _) in SCENARIOS.items()}
+        for value in options['weight']:
+            name, _, weight = value.partition('=')
+            if name not in SCENARIOS or not weight.isdigit():
+                raise CommandError(f'Неверный вес сценария: {value}')
+            weights[name] = int(weight)
+        missing = {
+            name
+            for names in (SETUP, *(names for _, names in SCENARIOS.values()))
+            for name in names if name not in steps
+        }
+        if missing:
+            raise CommandError(
+                f'Нет запросов в коллекции: {", ".join(sorted(missing))}'
+            )
+
+        variables['baseUrl'] = options['url'].rstrip('/')
+        result = asyncio.run(self.load(steps, variables, weights, options))
+        self.report(result, options)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'options': {
+                        key: options[key]
+                        for key in ('url', 'users', 'duration', 'seed')
+                    },
+                    'requests': result,
+                }, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self.compare(json.load(file)['requests'], result)
+
+    async def load(self, steps, variables, weights, options):
+        stats = defaultdict(
+            lambda: {'latencies': [], 'errors': Counter()}
+        )
+        run = uuid.uuid4().hex[:8]
+        users = []
+        for number in range(options['users']):
+            user_variables = dict(variables)
+            for key, template in USER_VARIABLES.items():
+                user_variables[key] = template.format(
+                    prefix=f'lt-{run}-{number}'
+                )
+            users.append(VirtualUser(
+                steps, user_variables, options['url'], options['timeout'],
+                stats,
+            ))
+        await asyncio.gather(*(user.setup() for user in users))
+        print(f'Пользователей: {len(users)}, подготовка завершена')
+
+        scenarios = [SCENARIOS[name][1] for name in weights]
+        started = time.monotonic()
+        deadline = started + options['duration']
+        await asyncio.gather(*(
+            user.run(
+                scenarios,
+                list(weights.values()),
+                random.Random(options['seed'] * 10007 + number),
+                deadline,
+                options['think_time'],
+            )
+            for number, user in enumerate(users)
+        ))
+        return summarize(stats, time.monotonic() - started)
+
+    def report(self, result, options):
+        print(
+            f'{"Запрос":<56} {"запр.":>6} {"запр./с":>8} {"ошибки":>7} '
+            f'{"p50":>7} {"p95":>7} {"p99":>7} {"макс":>7}'
+        )
+        for name, row in result.items():
+            print(
+                f'{name:<56} {row["requests"]:>6} {row["rps"]:>8.1f} '
+                f'{row["error_rate"]:>7.1%} {row["p50"]:>7.1f} '
+                f'{row["p95"]:>7.1f} {row["p99"]:>7.1f} {row["max"]:>7.1f}'
+            )
+        total = sum(row['requests'] for row in result.values())
+        errors = sum(row['errors'] for row in result.values())
+        print(
+            f'Всего: {total} запросов, '
+            f'{sum(row["rps"] for row in result.values()):.1f} запр./с, '
+            f'ошибок {errors / total if total else 0:.1%} '
+            '(задержки в мс)'
+        )
+        for name, row in result.items():
+            if row['error_statuses']:
+                statuses = ', '.join(
+                    f'{status}×{count}'
+                    for status, count in row['error_statuses'].items()
+                )
+                print(f'Ошибки {name}: {statuses}')
+
+    def compare(self, baseline, result):
+        print(
+            f'\n{"Сравнение с --compare":<56} {"запр./с":>16} {"p95, мс":>16} '
+            f'{"ошибки":>14}'
+        )
+        for name in sorted(set(baseline) | set(result)):
+            before, after = baseline.get(name), result.get(name)
+            if before is None or after is None:
+                run = 'новом' if before is None else 'старом'
+                print(f'{name:<56} только в {run} запуске')
+                continue
+            print(
+                f'{name:<56} '
+                f'{before["rps"]:>7.1f}→{after["rps"]:<8.1f}'
+                f'{before["p95"]:>7.1f}→{after["p95"]:<8.1f}'
+                f'{before["error_rate"]:>6.1%}→{after["error_rate"]:<6.1%}'
+            )
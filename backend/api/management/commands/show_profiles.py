@@ -0,0 +1,101 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+from foodgram.profiling import profile_names
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def load(name):
+    path = os.path.join(settings.PROFILE_DIR, name)
+    with open(f'{path}.json') as file:
+        profile = json.load(file)
+    stacks = Counter()
+    with open(f'{path}.collapsed') as file:
+        for line in file:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] += int(count)
+    return profile, stacks
+
+
+class Command(BaseCommand):
+    help = (
+        'Список профилей запросов (см. foodgram.profiling) или сводка '
+        'по одному профилю: самые частые функции, SQL и выделения памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name', nargs='?', help='имя профиля или last - последний'
+        )
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        names = profile_names()
+        if not names:
+            print(f'Профилей нет в {settings.PROFILE_DIR}')
+            return
+        if options['name'] is None:
+            self.show_list(names)
+            return
+        name = names[-1] if options['name'] == 'last' else options['name']
+        if name not in names:
+            raise CommandError(f'Профиль {name} не найден.')
+        self.show_profile(name, *load(name), options['top'])
+
+    def show_list(self, names):
+        for name in names:
+            profile, stacks = load(name)
+            print(
+                f'{name}  {profile["method"]} {profile["path"]} '
+                f'{profile["status"]}  {profile["duration"] * 1000:.1f} мс  '
+                f'SQL: {profile["query_count"]}  '
+                f'память: {profile["memory_peak"] / 1024:.0f} КБ'
+            )
+
+    def show_profile(self, name, profile, stacks, top):
+        samples = sum(stacks.values()) or 1
+        print(f'{name}: {profile["method"]} {profile["path"]}')
+        print(
+            f'Статус {profile["status"]}, '
+            f'{profile["duration"] * 1000:.1f} мс, '
+            f'{profile["samples"]} снимков раз в '
+            f'{profile["interval"] * 1000:g} мс'
+        )
+
+        own, inclusive = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        for title, counter in (
+            ('Собственное время', own), ('Время с вызовами', inclusive)
+        ):
+            print(f'\n{title}:')
+            for frame, count in counter.most_common(top):
+                print(f'{count / samples:7.1%}  {frame}')
+
+        queries = defaultdict(list)
+        for query in profile['queries']:
+            queries[query['sql']].append(query['duration'])
+        print(
+            f'\nSQL: {profile["query_count"]} запросов, '
+            f'{sum(map(sum, queries.values())) * 1000:.1f} мс'
+        )
+        for sql, durations in sorted(
+            queries.items(), key=lambda item: -sum(item[1])
+        )[:top]:
+            print(
+                f'{sum(durations) * 1000:8.1f} мс  ×{len(durations):<4} '
+                f'{sql[:200]}'
+            )
+
+        print(f'\nПик памяти: {profile["memory_peak"] / 1024:.0f} КБ')
+        for allocation in profile['allocations'][:top]:
+            print(
+                f'{allocation["size"] / 1024:8.1f} КБ  '
+                f'×{allocation["count"]:<6} {allocation["line"]}'
+            )
@@ -0,0 +1,25 @@
+from foodgram.routers import replica_reads, use_replica
+
+
+class ReplicaReadMixin:
+    """
+    Выполняет безопасные запросы к вьюсету на реплике базы данных.
+    replica_actions ограничивает список действий (None - все).
+    """
+
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        if use_replica(request) and (
+            self.replica_actions is None
+            or self.action in self.replica_actions
+        ):
+            self._replica_token = replica_reads.set(True)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,21 @@
+import codecs
+
+from api.renderers import orjson
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from django.conf import settings
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSONParser на orjson; без orjson и для не-UTF-8 - обычный парсер."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
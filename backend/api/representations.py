@@ -0,0 +1,598 @@
+"""
+Быстрый путь чтения для самых нагруженных ответов API.
+
+Словари ответа собираются прямо из строк values() заранее
+подготовленными геттерами, без создания сериализаторов DRF и без
+запросов на каждый объект: всё, что нужно странице (теги, ингредиенты,
+авторы, флаги пользователя), загружается пачкой по одному запросу.
+Порядок и значения полей совпадают с RecipesSerializer,
+RecipeLittleSerializer, ProfileSerializer и FollowSerializer, которые
+по-прежнему используются для валидации и записи.
+
+Клиент может сократить ответ параметрами запроса:
+    ?fields=id,name,image - только перечисленные поля;
+    ?omit=text,author - все поля, кроме перечисленных;
+    ?expand=tags - вложенные объекты, которые нужно раскрыть, остальные
+    заменяются на id (без параметра раскрываются все).
+Для пропущенных полей не выбираются колонки и не выполняются
+загрузчики, поэтому короткий ответ дешевле и для базы.
+"""
+import json
+from collections import defaultdict
+from functools import partial
+from operator import itemgetter
+
+from api.renderers import orjson
+from recipes.models import (
+    AmountIngredients,
+    Favourite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from rest_framework.exceptions import ValidationError
+from users.models import Follow, User
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Value,
+    Window
+)
+from django.db.models.functions import RowNumber
+
+RECIPE_FIELDS = ('id', 'name', 'image', 'text', 'cooking_time', 'author_id')
+RECIPE_LITTLE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+PROFILE_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+# поля рецепта, которые зависят от пользователя
+RECIPE_USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+# меняется вместе с форматом RECIPE: сохранённые в Recipe.representation
+# представления старого формата пересобираются
+RECIPE_BLOB_SCHEMA = 1
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+
+
+class Field:
+    """
+    Поле представления: геттер get(row, context), ключи загрузчиков
+    контекста и колонки values(), которые ему нужны. collapsed - поле,
+    которое заменяет вложенный объект, если его не нужно раскрывать.
+    """
+
+    def __init__(self, get, loaders=(), columns=(), collapsed=None):
+        self.get = get
+        self.loaders = frozenset(loaders)
+        self.columns = tuple(columns)
+        self.collapsed = collapsed
+
+
+class Representation:
+    """
+    Представление объекта: список пар (поле, Field). Колонки из <key>
+    выбираются всегда, по ним работают загрузчики.
+    """
+
+    def __init__(self, *fields, key=('id',)):
+        self.fields = fields
+        self.key = key
+        self.getters = tuple((name, field.get) for name, field in fields)
+
+    def __call__(self, row, context):
+        return {name: get(row, context) for name, get in self.getters}
+
+    def many(self, rows, context):
+        return [self(row, context) for row in rows]
+
+    @property
+    def loaders(self):
+        return frozenset().union(*(field.loaders for _, field in self.fields))
+
+    @property
+    def columns(self):
+        columns = dict.fromkeys(self.key)
+        for _, field in self.fields:
+            columns.update(dict.fromkeys(field.columns))
+        return tuple(columns)
+
+    def needed(self, loaders):
+        """Только те загрузчики из <loaders>, что нужны полям."""
+
+        return {
+            key: loader for key, loader in loaders.items()
+            if key in self.loaders
+        }
+
+    def select(self, fields=None, omit=(), expand=None):
+        """
+        Представление с полями <fields> (None - все) без полей <omit>.
+        Вложенные объекты не из <expand> сворачиваются (None - все
+        раскрыты). Неизвестные имена полей - ошибка валидации.
+        """
+
+        names = [name for name, _ in self.fields]
+        expandable = [
+            name for name, field in self.fields if field.collapsed is not None
+        ]
+        errors = {}
+        for param, values, allowed in (
+            (FIELDS_PARAM, fields or (), names),
+            (OMIT_PARAM, omit, names),
+            (EXPAND_PARAM, expand or (), expandable),
+        ):
+            unknown = [value for value in values if value not in allowed]
+            if unknown:
+                errors[param] = [
+                    f'Неизвестные поля: {", ".join(unknown)}. '
+                    f'Доступны: {", ".join(allowed)}.'
+                ]
+        if errors:
+            raise ValidationError(errors)
+
+        selected = []
+        for name, field in self.fields:
+            if (fields is not None and name not in fields) or name in omit:
+                continue
+            if field.collapsed is not None and expand is not None and (
+                name not in expand
+            ):
+                field = field.collapsed
+            selected.append((name, field))
+        return Representation(*selected, key=self.key)
+
+    def from_query(self, query_params):
+        """Представление по параметрам ?fields=, ?omit= и ?expand=."""
+
+        def names(param):
+            value = query_params.get(param)
+            if value is None:
+                return None
+            return [name.strip() for name in value.split(',') if name.strip()]
+
+        if not any(
+            param in query_params
+            for param in (FIELDS_PARAM, OMIT_PARAM, EXPAND_PARAM)
+        ):
+            return self
+        return self.select(
+            names(FIELDS_PARAM) or None, names(OMIT_PARAM) or (),
+            names(EXPAND_PARAM),
+        )
+
+
+def item(name):
+    get = itemgetter(name)
+    return Field(lambda row, context: get(row), columns=(name,))
+
+
+def image_url(name):
+    """Повторяет ImageField.to_representation для имени файла из values()."""
+
+    get, url = itemgetter(name), default_storage.url
+
+    def getter(row, context):
+        value = get(row)
+        if not value:
+            return None
+        request = context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url(value))
+        return url(value)
+
+    return Field(getter, columns=(name,))
+
+
+def member(key, name='id'):
+    """Входит ли значение поля <name> в множество context[<key>]."""
+
+    get = itemgetter(name)
+    return Field(
+        lambda row, context: get(row) in context[key],
+        loaders=(key,),
+        columns=(name,),
+    )
+
+
+def lookup(key, name='id', default=None, collapsed=None):
+    """Значение из словаря context[<key>] по полю <name>."""
+
+    get = itemgetter(name)
+    return Field(
+        lambda row, context: context[key].get(get(row), default),
+        loaders=(key,),
+        columns=(name,),
+        collapsed=collapsed,
+    )
+
+
+PROFILE = Representation(
+    *((name, item(name)) for name in PROFILE_FIELDS),
+    ('is_subscribed', member('subscribed')),
+)
+
+
+def author(row, context):
+    author = context['authors'].get(row['author_id'])
+    return None if author is None else PROFILE(author, context)
+
+
+RECIPE = Representation(
+    ('id', item('id')),
+    (
+        'tags',
+        lookup('tags', default=[], collapsed=lookup('tag_ids', default=[])),
+    ),
+    (
+        'author',
+        Field(
+            author,
+            loaders=('authors', 'subscribed'),
+            columns=('author_id',),
+            collapsed=item('author_id'),
+        ),
+    ),
+    (
+        'ingredients',
+        lookup(
+            'ingredients',
+            default=[],
+            collapsed=lookup('ingredient_amounts', default=[]),
+        ),
+    ),
+    ('is_favorited', member('favorited')),
+    ('is_in_shopping_cart', member('in_shopping_cart')),
+    ('name', item('name')),
+    ('image', image_url('image')),
+    ('text', item('text')),
+    ('cooking_time', item('cooking_time')),
+    key=('id', 'author_id'),
+)
+
+RECIPE_LITTLE = Representation(
+    ('id', item('id')),
+    ('name', item('name')),
+    ('image', image_url('image')),
+    ('cooking_time', item('cooking_time')),
+)
+
+
+def follow_recipes(row, context):
+    # FollowSerializer сериализует рецепты без request в контексте
+    return RECIPE_LITTLE.many(context['recipes'].get(row['id'], []), {})
+
+
+FOLLOW = Representation(
+    *((name, item(name)) for name in PROFILE_FIELDS),
+    ('is_subscribed', member('has_subscriptions')),
+    (
+        'recipes',
+        Field(
+            follow_recipes,
+            loaders=('recipes',),
+            collapsed=lookup('recipe_ids', default=[]),
+        ),
+    ),
+    ('recipes_count', lookup('recipes_count', default=0)),
+)
+
+
+def user_ids(queryset, user, ids_field):
+    """Множество id из <ids_field> записей пользователя (избранное и т.п.)."""
+
+    if not user.is_authenticated:
+        return set()
+    return set(queryset.filter(user=user).values_list(ids_field, flat=True))
+
+
+def ingredients_map(recipe_ids):
+    """Ингредиенты с количеством для нескольких рецептов одним запросом."""
+
+    ingredients = defaultdict(list)
+    # порядок добавления в рецепт, его даёт индекс recipes_amount_covering
+    rows = Ingredient.objects.filter(recipes__in=recipe_ids).order_by(
+        'recipe__recipe_id', 'recipe__id'
+    ).values(
+        'id',
+        'name',
+        'measurement_unit',
+        amount=F('recipe__amount'),
+        recipe_id=F('recipe__recipe_id'),
+    )
+    for row in rows:
+        ingredients[row.pop('recipe_id')].append(row)
+    return ingredients
+
+
+def tags_map(recipe_ids):
+    """Теги нескольких рецептов одним запросом."""
+
+    tags = defaultdict(list)
+    rows = Tag.objects.filter(recipes__in=recipe_ids).values(
+        'id', 'name', 'color', 'slug', recipe_id=F('recipes__id')
+    )
+    for row in rows:
+        tags[row.pop('recipe_id')].append(row)
+    return tags
+
+
+def tag_ids_map(recipe_ids):
+    """id тегов нескольких рецептов (свёрнутое поле tags)."""
+
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('recipe_id', 'tag_id')
+    for recipe_id, tag_id in rows:
+        tags[recipe_id].append(tag_id)
+    return tags
+
+
+def ingredient_amounts_map(recipe_ids):
+    """
+    id ингредиентов с количеством (свёрнутое поле ingredients) - в том
+    же виде, в каком они передаются при создании рецепта.
+    """
+
+    ingredients = defaultdict(list)
+    rows = AmountIngredients.objects.filter(
+        recipe__in=recipe_ids
+    ).order_by('recipe_id', 'id').values_list(
+        'recipe_id', 'ingredient_id', 'amount'
+    )
+    for recipe_id, ingredient_id, amount in rows:
+        ingredients[recipe_id].append({'id': ingredient_id, 'amount': amount})
+    return ingredients
+
+
+def profiles_map(user_ids):
+    return {
+        row['id']: row
+        for row in User.objects.filter(
+            id__in=user_ids, is_active=True
+        ).values(*PROFILE_FIELDS)
+    }
+
+
+def recipe_loaders(recipe_ids, author_ids, user):
+    """
+    Загрузчики данных для RECIPE: каждый делает один запрос и не
+    зависит от остальных, поэтому их можно выполнять одновременно.
+    <recipe_ids> и <author_ids> - списки или подзапросы.
+    """
+
+    return {
+        'tags': partial(tags_map, recipe_ids),
+        'tag_ids': partial(tag_ids_map, recipe_ids),
+        'ingredients': partial(ingredients_map, recipe_ids),
+        'ingredient_amounts': partial(ingredient_amounts_map, recipe_ids),
+        'authors': partial(profiles_map, author_ids),
+        'favorited': partial(
+            user_ids,
+            Favourite.objects.filter(recipe__in=recipe_ids),
+            user,
+            'recipe_id',
+        ),
+        'in_shopping_cart': partial(
+            user_ids,
+            ShoppingCart.objects.filter(recipe__in=recipe_ids),
+            user,
+            'recipe_id',
+        ),
+        'subscribed': partial(
+            user_ids,
+            Follow.objects.filter(following__in=author_ids),
+            user,
+            'following_id',
+        ),
+    }
+
+
+def recipes_limited(author_ids, limit, fields=RECIPE_LITTLE_FIELDS):
+    """
+    Рецепты авторов для FOLLOW: <limit> самых новых у каждого автора.
+    """
+
+    recipes = defaultdict(list)
+    rows = Recipe.objects.filter(author__in=author_ids).order_by('-id')
+    if limit is None:
+        rows = rows.values('author_id', *fields)
+    else:
+        rows = newest_per_author(rows, ('author_id', *fields), limit)
+    for row in rows:
+        recipes[row['author_id']].append(row)
+    return recipes
+
+
+def newest_per_author(queryset, fields, limit):
+    """
+    Строки <fields> первых <limit> рецептов каждого автора из
+    <queryset> одним запросом: номер рецепта у автора считает оконная
+    функция, лишние строки отбрасывает база. Django 3.2 не фильтрует по
+    оконным функциям, поэтому запрос оборачивается в SELECT вручную.
+    """
+
+    ranked = queryset.annotate(recipe_rank=Window(
+        RowNumber(),
+        partition_by=[F('author_id')],
+        order_by=F('id').desc(),
+    )).values(*fields, 'recipe_rank')
+    connection = connections[ranked.db]
+    sql, params = ranked.query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(quote(field) for field in fields)} '
+            f'FROM ({sql}) {quote("ranked")} '
+            f'WHERE {quote("recipe_rank")} <= %s '
+            f'ORDER BY {quote("id")} DESC',
+            (*params, limit),
+        )
+        return [dict(zip(fields, row)) for row in cursor.fetchall()]
+
+
+def recipe_ids_limited(author_ids, limit):
+    """id рецептов авторов (свёрнутое поле recipes)."""
+
+    return {
+        author_id: [row['id'] for row in rows]
+        for author_id, rows in recipes_limited(
+            author_ids, limit, ('id',)
+        ).items()
+    }
+
+
+def recipes_count(author_ids):
+    return dict(
+        Recipe.objects.filter(author__in=author_ids).values(
+            'author'
+        ).annotate(count=Count('id')).values_list('author', 'count')
+    )
+
+
+def has_subscriptions(user_ids):
+    return set(Follow.objects.filter(user__in=user_ids).values_list(
+        'user_id', flat=True
+    ))
+
+
+def follow_loaders(author_ids, limit):
+    """Загрузчики данных для FOLLOW, см. recipe_loaders."""
+
+    return {
+        'recipes': partial(recipes_limited, author_ids, limit),
+        'recipe_ids': partial(recipe_ids_limited, author_ids, limit),
+        'recipes_count': partial(recipes_count, author_ids),
+        'has_subscriptions': partial(has_subscriptions, author_ids),
+    }
+
+
+def load(loaders, **context):
+    """Последовательно выполняет загрузчики и собирает контекст."""
+
+    context.update((key, loader()) for key, loader in loaders.items())
+    return context
+
+
+def recipes_data(request, rows, representation=RECIPE):
+    """Представления рецептов из строк values(representation.columns)."""
+
+    rows = list(rows)
+    context = load(
+        representation.needed(recipe_loaders(
+            [row['id'] for row in rows],
+            {row['author_id'] for row in rows},
+            request.user,
+        )),
+        request=request,
+    )
+    return representation.many(rows, context)
+
+
+def profiles_data(request, rows, representation=PROFILE):
+    """Представления пользователей из строк values(representation.columns)."""
+
+    rows = list(rows)
+    context = load(representation.needed({
+        'subscribed': partial(
+            user_ids,
+            Follow.objects.filter(following__in=[row['id'] for row in rows]),
+            request.user,
+            'following_id',
+        ),
+    }))
+    return representation.many(rows, context)
+
+
+def follows_data(rows, limit, representation=FOLLOW):
+    """Представления подписок из строк values(representation.columns)."""
+
+    rows = list(rows)
+    context = load(
+        representation.needed(
+            follow_loaders([row['id'] for row in rows], limit)
+        )
+    )
+    return representation.many(rows, context)
+
+
+def recipe_blob(row):
+    """
+    Представление рецепта из строки values(RECIPE_FIELDS) без полей
+    пользователя - JSON-строка для Recipe.representation. is_subscribed
+    автора в нём всегда False, картинка - относительной ссылкой.
+    """
+
+    representation = RECIPE.select(omit=RECIPE_USER_FIELDS)
+    context = load(representation.needed(recipe_loaders(
+        [row['id']], [row['author_id']], AnonymousUser()
+    )))
+    data = {'schema': RECIPE_BLOB_SCHEMA, 'data': representation(row, context)}
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def recipe_user_flags(user):
+    """
+    Аннотации с полями пользователя для одного запроса к рецепту:
+    is_favorited, is_in_shopping_cart и is_subscribed (на автора).
+    """
+
+    if not user.is_authenticated:
+        false = Value(False, output_field=BooleanField())
+        return dict.fromkeys(
+            (*RECIPE_USER_FIELDS, 'is_subscribed'), false
+        )
+    return {
+        'is_favorited': Exists(Favourite.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        )),
+        'is_in_shopping_cart': Exists(ShoppingCart.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        )),
+        'is_subscribed': Exists(Follow.objects.filter(
+            following=OuterRef('author'), user=user
+        )),
+    }
+
+
+def recipe_etag(row):
+    """ETag рецепта: его версия и поля пользователя."""
+
+    flags = ''.join(
+        str(int(row[name]))
+        for name in (*RECIPE_USER_FIELDS, 'is_subscribed')
+    )
+    return f'"{row["id"]}.{row["version"]}.{RECIPE_BLOB_SCHEMA}.{flags}"'
+
+
+def load_recipe_blob(value):
+    """Сохранённое представление или None, если его нет или формат старый."""
+
+    if value is None:
+        return None
+    blob = orjson.loads(value) if orjson is not None else json.loads(value)
+    return blob['data'] if blob.get('schema') == RECIPE_BLOB_SCHEMA else None
+
+
+def recipe_from_blob(request, data, row):
+    """Полное представление RECIPE из сохранённого и полей пользователя."""
+
+    if data['author'] is not None:
+        data['author']['is_subscribed'] = row['is_subscribed']
+    if data['image']:
+        data['image'] = request.build_absolute_uri(data['image'])
+    return {
+        name: row[name] if name in RECIPE_USER_FIELDS else data[name]
+        for name, _ in RECIPE.fields
+    }
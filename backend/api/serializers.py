@@ -9,6 +9,7 @@ from users.models import Follow, User
 
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.db import transaction
 from django.db.models import F
 
 
@@ -144,6 +145,7 @@ class RecipesSerializer(serializers.ModelSerializer):
         )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -152,6 +154,7 @@ class RecipesSerializer(serializers.ModelSerializer):
         recipe_ingredients_set(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
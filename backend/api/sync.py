@@ -0,0 +1,84 @@
+"""
+Инкрементальная синхронизация: /api/sync/?since=<token> возвращает
+изменения рецептов, избранного, списка покупок и подписок, сделанные
+после изменения с номером <token> (см. sync.models.Change).
+
+Ответ:
+    token - токен для следующего запроса;
+    has_more - есть ли ещё изменения (запросите снова с новым token);
+    recipes - изменённые рецепты целиком и id удалённых;
+    favorites, shopping_cart - id добавленных и удалённых рецептов;
+    subscriptions - id авторов, на которых подписались и отписались.
+Без since возвращается всё текущее состояние. Удаление рецепта
+означает и его удаление из избранного и списка покупок.
+"""
+import foodgram.constants as var
+from api.representations import RECIPE, recipes_data
+from recipes.models import Recipe
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from sync.models import Change
+
+
+def int_param(request, name, default, maximum=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or (maximum is not None and int(value) > maximum):
+        limit = f' не больше {maximum}' if maximum is not None else ''
+        raise ValidationError({name: [f'Ожидается целое число{limit}.']})
+    return int(value)
+
+
+class SyncView(APIView):
+    """Изменения после токена ?since=, по ?limit= изменений за раз."""
+
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        since = int_param(request, 'since', 0)
+        limit = int_param(
+            request, 'limit', var.SYNC_PAGE_SIZE, var.SYNC_MAX_PAGE_SIZE
+        )
+        representation = RECIPE.from_query(request.query_params)
+        changes = list(
+            Change.objects.visible_to(request.user).filter(
+                id__gt=since
+            ).order_by('id')[:limit + 1]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # из нескольких изменений одного объекта важно последнее
+        latest = {}
+        for change in changes:
+            latest[(change.kind, change.key)] = change
+        result = {
+            kind: {'updated': [], 'deleted': []} for kind, _ in Change.KINDS
+        }
+        for (kind, key), change in latest.items():
+            result[kind]['deleted' if change.deleted else 'updated'].append(
+                key
+            )
+
+        # рецепт мог быть удалён позже - его tombstone придёт дальше
+        updated = result[Change.RECIPES]['updated']
+        rows = list(
+            Recipe.objects.filter(id__in=updated).values(
+                *representation.columns
+            )
+        )
+        recipes = dict(zip(
+            (row['id'] for row in rows),
+            recipes_data(request, rows, representation),
+        ))
+        result[Change.RECIPES]['updated'] = [
+            recipes[key] for key in updated if key in recipes
+        ]
+        return Response({
+            'token': changes[-1].id if changes else since,
+            'has_more': has_more,
+            **result,
+        })
@@ -1,6 +1,9 @@
+from api.batch import BatchView
+from api.sync import SyncView
 from api.views import IngredientViewSet, RecipesViewSet, TagViewSet
 from rest_framework import routers
 
+from django.conf import settings
 from django.urls import include, path
 
 router_v1 = routers.DefaultRouter()
@@ -10,6 +13,19 @@ router_v1.register(r'tags', TagViewSet, basename='Tags')
 
 
 urlpatterns = [
+    path('batch/', BatchView.as_view()),
+    path('sync/', SyncView.as_view()),
     path('', include(router_v1.urls)),
     path('', include('users.urls')),
 ]
+
+if settings.ASYNC_API:
+    from api import async_views
+
+    urlpatterns = [
+        path('ingredients/', async_views.ingredient_list),
+        path('recipes/', async_views.recipe_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('tags/', async_views.tag_list),
+        path('users/subscriptions/', async_views.subscriptions),
+    ] + urlpatterns
@@ -1,6 +1,18 @@
+import foodgram.constants as var
 from api.filters import IngredientSearchFilter, RecipeFilter
 from api.func import create_dependence, delete_dependence
+from api.mixins import ReplicaReadMixin
 from api.paginators import PageLimitPagination
+from api.representations import (
+    RECIPE,
+    RECIPE_FIELDS,
+    load_recipe_blob,
+    recipe_blob,
+    recipe_etag,
+    recipe_from_blob,
+    recipe_user_flags,
+    recipes_data
+)
 from api.serializers import (
     FavouriteSerializer,
     IngredientSerializer,
@@ -9,6 +21,8 @@ from api.serializers import (
     TagSerializer
 )
 from django_filters.rest_framework import DjangoFilterBackend
+from foodgram.metrics import cache_result
+from recipes.cooccurrence import get_suggestions
 from recipes.models import (
     AmountIngredients,
     Favourite,
@@ -17,16 +31,31 @@ from recipes.models import (
     ShoppingCart,
     Tag
 )
+from recipes.similarity import similar_ids
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+def etag_matches(request, etag):
+    """Совпадает ли ETag с одним из If-None-Match (слабое сравнение)."""
+
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    return any(
+        tag == '*' or tag.removeprefix('W/') == etag
+        for tag in (tag.strip() for tag in header.split(','))
+    )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -34,8 +63,42 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (IngredientSearchFilter, )
     search_fields = ('^name', )
 
+    @action(
+        detail=False,
+        methods=['get'],
+    )
+    def suggest(self, request):
+        """
+        Подсказки для редактора рецепта: ?name= - начало названия,
+        ?ingredients=1,2,3 - уже выбранные ингредиенты, ?limit= - сколько
+        подсказок вернуть. Первыми идут ингредиенты, которые чаще всего
+        встречаются вместе с выбранными (см. recipes.cooccurrence).
+        """
+
+        params = request.query_params
+        values = [
+            value for value in params.get('ingredients', '').split(',')
+            if value.strip()
+        ]
+        if not all(value.strip().isdigit() for value in values):
+            raise ValidationError(
+                {'ingredients': ['Ожидаются id через запятую.']}
+            )
+        limit = params.get('limit', var.INGREDIENT_SUGGEST_LIMIT)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if not 0 < limit <= var.INGREDIENT_SUGGEST_MAX_LIMIT:
+            raise ValidationError({'limit': [
+                f'Ожидается число от 1 до {var.INGREDIENT_SUGGEST_MAX_LIMIT}.'
+            ]})
+        return Response(get_suggestions().suggest(
+            params.get('name', ''), [int(value) for value in values], limit
+        ))
+
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = RecipesSerializer
     http_method_names = ('get', 'post', 'patch', 'delete')
     pagination_class = PageLimitPagination
@@ -48,6 +111,193 @@ class RecipesViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    batch_query_param = 'ids'
+    # ?period= для /recipes/popular/ -> поле RecipeScore
+    popular_periods = {'trending': 'trending', 'all': 'total'}
+
+    def get_representation(self):
+        """Представление рецепта с учётом ?fields=, ?omit= и ?expand=."""
+
+        return RECIPE.from_query(self.request.query_params)
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'popular', 'similar'):
+            # быстрый путь чтения, см. api.representations
+            return Recipe.objects.order_by('-id').values(
+                *self.get_representation().columns
+            )
+        return super().get_queryset()
+
+    def get_batch_ids(self):
+        """Список id из ?ids=1,2,3 без повторов, в исходном порядке."""
+
+        values = self.request.query_params[self.batch_query_param].split(',')
+        if not all(value.strip().isdigit() for value in values):
+            raise ValidationError(
+                {self.batch_query_param: ['Ожидаются id через запятую.']}
+            )
+        ids = list(dict.fromkeys(int(value) for value in values))
+        if len(ids) > var.RECIPE_BATCH_MAX_IDS:
+            raise ValidationError({
+                self.batch_query_param: [
+                    f'Не больше {var.RECIPE_BATCH_MAX_IDS} id за запрос.'
+                ]
+            })
+        return ids
+
+    def batch(self, request):
+        """
+        Рецепты по списку id в порядке запроса. Фильтры применяются как
+        обычно; id, для которых рецепт не найден, перечислены в missing.
+        """
+
+        ids = self.get_batch_ids()
+        rows = list(
+            self.filter_queryset(self.get_queryset()).filter(id__in=ids)
+        )
+        # id есть в каждой строке, даже если его нет среди ?fields=
+        recipes = dict(zip(
+            (row['id'] for row in rows),
+            recipes_data(request, rows, self.get_representation()),
+        ))
+        return Response({
+            'results': [
+                recipes[recipe_id] for recipe_id in ids
+                if recipe_id in recipes
+            ],
+            'missing': [
+                recipe_id for recipe_id in ids if recipe_id not in recipes
+            ],
+        })
+
+    def list(self, request, *args, **kwargs):
+        if self.batch_query_param in request.query_params:
+            return self.batch(request)
+        representation = self.get_representation()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                recipes_data(request, page, representation)
+            )
+        return Response(recipes_data(request, queryset, representation))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.query_params:
+            return Response(recipes_data(
+                request, [self.get_object()], self.get_representation()
+            )[0])
+        return self.retrieve_cached(request, kwargs[self.lookup_field])
+
+    def retrieve_cached(self, request, pk):
+        """
+        Полный рецепт одним запросом: общая часть берётся из
+        Recipe.representation (собирается при первом чтении после
+        изменения), поля пользователя - подзапросами EXISTS. ETag
+        строится из версии рецепта и полей пользователя, поэтому на
+        If-None-Match с тем же ETag ответ 304 отдаётся без сборки JSON.
+        """
+
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        row = Recipe.objects.filter(id=pk).values(
+            'id', 'version', 'representation',
+            **recipe_user_flags(request.user),
+        ).first()
+        if row is None:
+            raise Http404
+        etag = recipe_etag(row)
+        matched = etag_matches(request, etag)
+        if 'If-None-Match' in request.headers:
+            cache_result('recipe_etag', matched)
+        if matched:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = load_recipe_blob(row['representation'])
+            cache_result('recipe_representation', data is not None)
+            if data is None:
+                blob = recipe_blob(
+                    Recipe.objects.values(*RECIPE_FIELDS).get(id=pk)
+                )
+                # не затираем представление, если рецепт успели изменить
+                Recipe.objects.filter(id=pk, version=row['version']).update(
+                    representation=blob
+                )
+                data = load_recipe_blob(blob)
+            response = Response(recipe_from_blob(request, data, row))
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(AllowAny,),
+    )
+    def popular(self, request):
+        """
+        Самые популярные рецепты по RecipeScore: ?period=trending
+        (по умолчанию) - с затуханием старых событий, ?period=all - за
+        всё время. Фильтры и пагинация - как у списка рецептов.
+        """
+
+        period = request.query_params.get('period', 'trending')
+        if period not in self.popular_periods:
+            raise ValidationError({'period': [
+                'Ожидается одно из: '
+                f'{", ".join(self.popular_periods)}.'
+            ]})
+        field = self.popular_periods[period]
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            score__total__gt=0
+        ).order_by(f'-score__{field}', '-id')
+        representation = self.get_representation()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                recipes_data(request, page, representation)
+            )
+        return Response(recipes_data(request, queryset, representation))
+
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=(AllowAny,),
+    )
+    def similar(self, request, pk):
+        """
+        Рецепты с похожим набором ингредиентов и тегов, самые похожие
+        первыми (см. recipes.similarity). ?limit= - сколько рецептов
+        вернуть; фильтры - как у списка рецептов.
+        """
+
+        limit = request.query_params.get('limit', var.SIMILAR_RECIPES_LIMIT)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if not 0 < limit <= var.SIMILAR_RECIPES_MAX_LIMIT:
+            raise ValidationError({'limit': [
+                f'Ожидается число от 1 до {var.SIMILAR_RECIPES_MAX_LIMIT}.'
+            ]})
+        recipe = Recipe.objects.filter(
+            id=self.kwargs[self.lookup_field]
+        ).values('id', 'version').first()
+        if recipe is None:
+            raise Http404
+        ids = similar_ids(recipe['id'], recipe['version'], limit)
+        rows = {
+            row['id']: row for row in self.filter_queryset(
+                self.get_queryset()
+            ).filter(id__in=ids)
+        }
+        return Response(recipes_data(
+            request,
+            [rows[recipe_id] for recipe_id in ids if recipe_id in rows],
+            self.get_representation(),
+        ))
 
     @action(
         detail=True,
@@ -105,7 +355,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         return response
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
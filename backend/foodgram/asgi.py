@@ -2,6 +2,17 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# импорт после настройки Django: модулю нужны модели
+from api.events import EVENTS_PATH, stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Поток /api/events/ обслуживается в обход обработчика Django."""
+
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await stream(scope, receive, send)
+    return await django_application(scope, receive, send)
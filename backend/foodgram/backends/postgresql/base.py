@@ -0,0 +1,7 @@
+from foodgram.connections import PersistentConnectionMixin
+
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(PersistentConnectionMixin, base.DatabaseWrapper):
+    pass
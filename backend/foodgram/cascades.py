@@ -0,0 +1,195 @@
+"""
+Каскадное удаление на уровне базы данных.
+
+Внешние ключи из DB_CASCADES объявлены в моделях с on_delete=DO_NOTHING,
+поэтому Django не загружает зависимые строки при удалении. Само правило
+ON DELETE CASCADE / SET NULL миграции навешивают на ограничения внешних
+ключей в PostgreSQL, и удаление рецепта или пользователя выполняется
+одним запросом.
+
+На остальных СУБД (SQLite при локальной разработке) правила повторяются
+в Python: по одному UPDATE/DELETE на каждую зависимую таблицу.
+
+Перед удалением отправляется сигнал cascade_delete(sender=модель,
+pks=ключи, using=база, db_cascades=...): строки, которые СУБД удалит
+или отвяжет сама, сигналов Django не получат, и это единственный способ
+узнать о них. db_cascades=False значит, что зависимые строки удаляются
+через ORM (эмуляция или delete_in_chunks) и post_delete для них придёт.
+Отвязка (SET NULL) сигналов не даёт никогда.
+"""
+from django.apps import apps as global_apps
+from django.db import connections, models, router, transaction
+from django.dispatch import Signal
+
+CASCADE = 'CASCADE'
+SET_NULL = 'SET NULL'
+
+cascade_delete = Signal()
+
+# (приложение, модель, внешний ключ, действие при удалении)
+DB_CASCADES = (
+    ('recipes', 'amountingredients', 'recipe', CASCADE),
+    ('recipes', 'favourite', 'recipe', CASCADE),
+    ('recipes', 'favourite', 'user', CASCADE),
+    ('recipes', 'shoppingcart', 'recipe', CASCADE),
+    ('recipes', 'shoppingcart', 'user', CASCADE),
+    ('recipes', 'recipescore', 'recipe', CASCADE),
+    ('recipes', 'recipe', 'author', SET_NULL),
+    ('users', 'follow', 'user', CASCADE),
+    ('users', 'follow', 'following', CASCADE),
+)
+
+
+def supports_db_cascades(using):
+    """Навешаны ли правила ON DELETE на ограничения в базе <using>."""
+
+    return connections[using].vendor == 'postgresql'
+
+
+def related_cascades(model, apps=global_apps):
+    """Внешние ключи из DB_CASCADES, которые ссылаются на модель <model>."""
+
+    for app_label, model_name, field_name, action in DB_CASCADES:
+        field = apps.get_model(app_label, model_name)._meta.get_field(
+            field_name
+        )
+        if field.related_model._meta.concrete_model is model:
+            yield field, action
+
+
+def emulate_db_cascades(model, pks, using):
+    """
+    Повторяет правила ON DELETE для объектов <model> с ключами <pks>
+    там, где СУБД не выполняет их сама.
+    """
+
+    if supports_db_cascades(using):
+        return
+    for field, action in related_cascades(model._meta.concrete_model):
+        queryset = field.model._base_manager.using(using).filter(
+            **{f'{field.name}__in': pks}
+        )
+        if action == SET_NULL:
+            queryset.update(**{field.name: None})
+        else:
+            queryset.delete()
+
+
+def delete_in_chunks(obj, chunk_size):
+    """
+    Удаляет объект, у которого слишком много зависимых строк для
+    одного запроса: зависимые строки удаляются (или отвязываются)
+    пачками по <chunk_size> в отдельных коротких транзакциях,
+    и только потом удаляется сам объект.
+    """
+
+    model = type(obj)._meta.concrete_model
+    using = router.db_for_write(model, instance=obj)
+    # пачки удаляются через ORM и сами отправляют post_delete
+    cascade_delete.send(
+        sender=model, pks=[obj.pk], using=using, db_cascades=False
+    )
+    for field, action in related_cascades(model):
+        manager = field.model._base_manager.db_manager(using)
+        while True:
+            with transaction.atomic(using=using):
+                pks = list(
+                    manager.filter(**{field.name: obj.pk}).values_list(
+                        'pk', flat=True
+                    )[:chunk_size]
+                )
+                if not pks:
+                    break
+                chunk = manager.filter(pk__in=pks)
+                if action == SET_NULL:
+                    chunk.update(**{field.name: None})
+                else:
+                    chunk.delete()
+    return obj.delete(using=using)
+
+
+def _constraint_sql(schema_editor, model, field, action):
+    table = model._meta.db_table
+    to_table = field.related_model._meta.db_table
+    to_column = field.target_field.column
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(
+            cursor, table
+        )
+    quote = schema_editor.quote_name
+    for name, constraint in constraints.items():
+        if (
+            constraint['foreign_key'] == (to_table, to_column)
+            and constraint['columns'] == [field.column]
+        ):
+            on_delete = f' ON DELETE {action}' if action else ''
+            yield (
+                f'ALTER TABLE {quote(table)} '
+                f'DROP CONSTRAINT {quote(name)}, '
+                f'ADD CONSTRAINT {quote(name)} '
+                f'FOREIGN KEY ({quote(field.column)}) '
+                f'REFERENCES {quote(to_table)} ({quote(to_column)})'
+                f'{on_delete} DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+def set_db_cascades(app_label, enabled=True, model_names=None):
+    """
+    Возвращает функцию для migrations.RunPython, которая навешивает
+    (или снимает при enabled=False) правила ON DELETE на внешние ключи
+    приложения <app_label> из DB_CASCADES - всех его моделей или только
+    <model_names>.
+    """
+
+    def operation(apps, schema_editor):
+        if not supports_db_cascades(schema_editor.connection.alias):
+            return
+        for label, model_name, field_name, action in DB_CASCADES:
+            if label != app_label or (
+                model_names is not None and model_name not in model_names
+            ):
+                continue
+            model = apps.get_model(label, model_name)
+            field = model._meta.get_field(field_name)
+            for sql in _constraint_sql(
+                schema_editor, model, field, action if enabled else None
+            ):
+                schema_editor.execute(sql)
+
+    return operation
+
+
+class CascadeQuerySet(models.QuerySet):
+    """QuerySet, удаление которого учитывает правила из DB_CASCADES."""
+
+    def delete(self):
+        # ключи выбираются заранее: условия запроса могут ссылаться на
+        # зависимые строки, которые удалит эмуляция
+        pks = list(self.values_list('pk', flat=True))
+        cascade_delete.send(
+            sender=self.model, pks=pks, using=self.db,
+            db_cascades=supports_db_cascades(self.db),
+        )
+        emulate_db_cascades(self.model, pks, self.db)
+        return self.model._base_manager.using(self.db).filter(
+            pk__in=pks
+        ).delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class CascadeModel(models.Model):
+    """Модель, удаление экземпляра которой учитывает DB_CASCADES."""
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        cascade_delete.send(
+            sender=type(self), pks=[self.pk], using=using,
+            db_cascades=supports_db_cascades(using),
+        )
+        emulate_db_cascades(type(self), [self.pk], using)
+        return super().delete(using=using, keep_parents=keep_parents)
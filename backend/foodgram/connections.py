@@ -0,0 +1,63 @@
+"""
+Постоянные соединения с базой данных.
+
+С CONN_MAX_AGE соединение воркера живёт между запросами, и запрос не
+тратит время на подключение. Django 3.2 закрывает такое соединение
+только после ошибки в нём или по возрасту, а разрыв, случившийся между
+запросами (перезапуск PostgreSQL, PgBouncer закрыл серверное
+соединение), увидит первый же запрос - и упадёт. Поэтому при
+CONN_HEALTH_CHECKS соединение, оставшееся от прошлого запроса,
+проверяется перед первым запросом к базе в новом HTTP-запросе и при
+ошибке открывается заново (в Django 4.1 то же делает одноимённая
+настройка).
+
+Открытие соединений, его время, повторное использование и неудачные
+проверки записываются в метрики (foodgram.metrics); доля повторного
+использования - foodgram_db_connections_reused_total к сумме его и
+foodgram_db_connections_total. Обёртка также подключает к соединению
+учёт SQL-запросов для метрик и профилировщика (foodgram.profiling).
+"""
+import time
+
+from foodgram import metrics, profiling
+
+
+class PersistentConnectionMixin:
+    """Проверка и учёт постоянных соединений для DatabaseWrapper."""
+
+    health_check_done = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.execute_wrappers.extend(
+            (metrics.observe_query, profiling.record_query)
+        )
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.DB_CONNECT_SECONDS.labels(self.alias).observe(
+            time.perf_counter() - started
+        )
+        metrics.DB_CONNECTIONS.labels(self.alias).inc()
+        # только что открытое соединение проверять незачем
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # вызывается в начале и в конце каждого запроса
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def _cursor(self, name=None):
+        if self.connection is not None and not self.health_check_done:
+            self.health_check_done = True
+            if (
+                self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.in_atomic_block
+                and not self.is_usable()
+            ):
+                metrics.DB_HEALTH_CHECK_FAILURES.labels(self.alias).inc()
+                self.close()
+            else:
+                metrics.DB_CONNECTIONS_REUSED.labels(self.alias).inc()
+        return super()._cursor(name)
@@ -36,3 +36,85 @@ TAG_MAX_NAME = 200
 
 # Максимальная длина <slug> тега
 TAG_MAX_LEN_SLUG_NAME = 200
+
+# Как долго (в секундах) процесс хранит словарь slug -> id тегов
+TAG_CACHE_SECONDS = 60
+
+# Максимальное число рецептов в одном запросе /recipes/?ids=
+RECIPE_BATCH_MAX_IDS = 100
+
+# Максимальное число подзапросов в одном запросе /batch/
+BATCH_MAX_REQUESTS = 10
+
+# Изменений на странице /sync/ по умолчанию
+SYNC_PAGE_SIZE = 100
+
+# Максимальное число изменений на странице /sync/
+SYNC_MAX_PAGE_SIZE = 1000
+
+# Вес добавления рецепта в избранное в рейтинге /recipes/popular/
+POPULAR_FAVORITE_WEIGHT = 2
+
+# Вес добавления рецепта в список покупок в рейтинге /recipes/popular/
+POPULAR_SHOPPING_CART_WEIGHT = 1
+
+# За сколько дней вклад события в текущий рейтинг уменьшается вдвое
+POPULAR_HALF_LIFE_DAYS = 7
+
+# Длина MinHash-сигнатуры рецепта для /recipes/<id>/similar/
+SIMILARITY_HASHES = 64
+
+# Число LSH-полос сигнатуры (делит SIMILARITY_HASHES): чем больше полос,
+# тем менее похожие рецепты попадают в кандидаты
+SIMILARITY_BANDS = 32
+
+# Похожих рецептов в ответе /recipes/<id>/similar/ по умолчанию
+SIMILAR_RECIPES_LIMIT = 6
+
+# Максимальное число похожих рецептов в ответе
+SIMILAR_RECIPES_MAX_LIMIT = 50
+
+# Сколько лучших соседей по PMI хранится для каждого ингредиента
+COOCCURRENCE_TOP_K = 20
+
+# В скольких рецептах пара ингредиентов должна встретиться, чтобы
+# попасть в подсказки (редкие пары дают случайно высокий PMI)
+COOCCURRENCE_MIN_RECIPES = 2
+
+# Как часто (в секундах) процесс перечитывает подсказки из базы
+COOCCURRENCE_RELOAD_SECONDS = 300
+
+# Подсказок ингредиентов в ответе /ingredients/suggest/ по умолчанию
+INGREDIENT_SUGGEST_LIMIT = 10
+
+# Максимальное число подсказок ингредиентов в ответе
+INGREDIENT_SUGGEST_MAX_LIMIT = 50
+
+# Сколько раз выполняется фоновая задача, прежде чем считается неудачной
+JOB_MAX_ATTEMPTS = 5
+
+# Пауза перед первым повтором задачи (в секундах), дальше она удваивается
+JOB_RETRY_DELAY_SECONDS = 10
+
+# Максимальная пауза перед повтором задачи (в секундах)
+JOB_RETRY_MAX_DELAY_SECONDS = 3600
+
+# Через сколько секунд задачу, чей воркер пропал, можно взять заново
+JOB_TIMEOUT_SECONDS = 600
+
+# Как часто (в секундах) свободный воркер проверяет очередь
+JOB_POLL_SECONDS = 1
+
+# Сколько дней хранятся выполненные задачи
+JOB_KEEP_DAYS = 7
+
+# С какого размера таблицы админка показывает оценку числа строк
+# (статистику PostgreSQL) вместо COUNT(*)
+ADMIN_ESTIMATED_COUNT_FROM = 10000
+
+# Сколько рецептов можно обновить в микрокэше gateway за одно изменение;
+# если затронуто больше, их записи устареют сами (см. foodgram.gateway)
+GATEWAY_PURGE_MAX_RECIPES = 100
+
+# Сколько секунд ждать ответа gateway при обновлении микрокэша
+GATEWAY_REFRESH_TIMEOUT_SECONDS = 10
@@ -0,0 +1,157 @@
+"""
+Публикация и подписка на события (pub/sub) внутри процесса.
+
+Брокер выбирается настройкой EVENTS_BROKER:
+    InMemoryBroker - события доходят только до подписчиков того же
+    процесса (один воркер, локальная разработка);
+    PostgresBroker - события рассылаются через LISTEN/NOTIFY PostgreSQL
+    и доходят до подписчиков во всех воркерах.
+
+Подписки живут в цикле событий ASGI, а публиковать можно из любого
+потока (обработчики сигналов Django работают в синхронном коде).
+Очередь подписчика ограничена EVENTS_QUEUE_SIZE: если клиент не
+успевает читать, подписка помечается переполненной и закрывается,
+а клиент должен догнать изменения через /api/sync/.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Подписка на несколько каналов с ограниченной очередью."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        # вызывается только в потоке цикла событий
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """Рассылка подписчикам текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(
+            self, channels, settings.EVENTS_QUEUE_SIZE
+        )
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[channel]
+
+    def publish(self, channel, message):
+        """Отправляет сообщение подписчикам канала из любого потока."""
+
+        with self.lock:
+            subscribers = tuple(self.subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.put, message
+                )
+            except RuntimeError:
+                # цикл событий подписчика уже остановлен
+                self.unsubscribe(subscription)
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    Рассылка между процессами через NOTIFY: publish отправляет
+    уведомление, а поток-слушатель каждого процесса получает его по
+    LISTEN и раздаёт своим подписчикам.
+    """
+
+    pg_channel = 'foodgram_events'
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def subscribe(self, channels):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name='events-listener', daemon=True
+                )
+                self.listener.start()
+        return super().subscribe(channels)
+
+    def publish(self, channel, message):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [self.pg_channel, json.dumps([channel, message])],
+            )
+
+    def listen(self):
+        database = connections[DEFAULT_DB_ALIAS]
+        while True:
+            connection = None
+            try:
+                connection = database.get_new_connection(
+                    database.get_connection_params()
+                )
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                while True:
+                    select.select([connection], [], [], 60)
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        channel, message = json.loads(notify.payload)
+                        super().publish(channel, message)
+            except Exception:
+                logger.exception('Потеряно подключение LISTEN, повтор')
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+_broker = None
+
+
+def get_broker():
+    """Брокер из настройки EVENTS_BROKER (один на процесс)."""
+
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
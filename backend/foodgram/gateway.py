@@ -0,0 +1,107 @@
+"""
+Обновление микрокэша API в gateway (nginx, см. gateway/nginx.conf).
+
+nginx кэширует ответы на анонимные GET-запросы /api/ на несколько
+секунд. Чтобы изменения рецептов, тегов и ингредиентов были видны
+сразу, сигналы (recipes.signals) и RecipeQuerySet.touch() вызывают
+purge() с адресами, где изменение видно. После фиксации транзакции
+адреса одной фоновой задачей (jobs.queue) запрашиваются через
+служебный порт gateway (GATEWAY_CACHE_URL): там nginx всегда
+обращается к бэкенду и заменяет запись кэша свежим ответом. Удалять
+записи nginx умеет только в коммерческой версии (proxy_cache_purge).
+
+Ключ кэша - хост, адрес с параметрами и кодировка ответа, поэтому
+адрес обновляется для каждого хоста из GATEWAY_CACHE_HOSTS и каждой
+кодировки из ENCODINGS. Адреса с параметрами (фильтры, страницы) не
+перечислить: они устаревают не дольше срока жизни записи.
+Без GATEWAY_CACHE_URL (локальная разработка) purge() ничего не делает.
+"""
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import foodgram.constants as var
+from jobs.queue import enqueue, task
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+# кодировки в ключе кэша, как в map $api_encoding в nginx.conf
+ENCODINGS = ('br', 'gzip', '')
+
+# адреса, ждущие фиксации транзакции
+_pending = threading.local()
+
+
+def resource_paths(basename, ids=()):
+    """Список и объекты <ids> ресурса роутера с именем <basename>."""
+
+    return [reverse(f'{basename}-list')] + [
+        reverse(f'{basename}-detail', args=[pk]) for pk in ids
+    ]
+
+
+def purge(paths):
+    """Обновляет записи кэша по адресам <paths> после фиксации транзакции."""
+
+    if not settings.GATEWAY_CACHE_URL:
+        return
+    pending = getattr(_pending, 'paths', None)
+    if pending is None:
+        pending = _pending.paths = set()
+    pending.update(paths)
+    # одна задача на транзакцию: первый вызов flush забирает все адреса;
+    # после отката адреса уйдут с задачей следующей транзакции
+    transaction.on_commit(flush)
+
+
+def purge_recipes(queryset):
+    """Обновляет адреса рецептов из <queryset>, если их немного."""
+
+    if not settings.GATEWAY_CACHE_URL:
+        return
+    ids = list(queryset.values_list('id', flat=True)[
+        :var.GATEWAY_PURGE_MAX_RECIPES + 1
+    ])
+    if len(ids) > var.GATEWAY_PURGE_MAX_RECIPES:
+        ids = []
+    purge(resource_paths('Recipes', ids))
+
+
+def flush():
+    pending = getattr(_pending, 'paths', None)
+    if pending:
+        _pending.paths = None
+        enqueue(refresh, {'paths': sorted(pending)})
+
+
+def fetch(path, host, encoding):
+    request = Request(
+        settings.GATEWAY_CACHE_URL.rstrip('/') + path,
+        headers={
+            'Host': host,
+            'Accept': 'application/json',
+            'Accept-Encoding': encoding,
+        },
+    )
+    try:
+        with urlopen(
+            request, timeout=var.GATEWAY_REFRESH_TIMEOUT_SECONDS
+        ) as response:
+            response.read()
+    except HTTPError as error:
+        error.close()
+        # 404 удалённого объекта тоже заменяет запись кэша
+        if error.code >= 500:
+            raise
+
+
+@task
+def refresh(paths):
+    """Запрашивает <paths> через служебный порт gateway."""
+
+    for path in paths:
+        for host in settings.GATEWAY_CACHE_HOSTS:
+            for encoding in ENCODINGS:
+                fetch(path, host, encoding)
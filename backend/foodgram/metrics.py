@@ -0,0 +1,220 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Метрики собирает prometheus_client. Под gunicorn у каждого воркера
+свои значения, поэтому задаётся каталог PROMETHEUS_MULTIPROC_DIR:
+воркеры пишут значения в файлы, отображённые в память (mmap), а
+/metrics складывает файлы всех воркеров. Без каталога (runserver)
+значения живут в памяти процесса.
+
+MetricsMiddleware стоит первым и видит ответ уже сжатым. Для каждого
+запроса записываются время, размер ответа, число и время SQL-запросов;
+обработчик подписывается именем вьюсета и действия
+(RecipesViewSet.list), чтобы число меток не зависело от URL. Время
+каждого SQL-запроса измеряет observe_query, который подключают
+обёртки соединений из foodgram.backends.
+
+Холодный старт воркера: gunicorn.conf.py записывает время загрузки
+приложения и прогрева, а первый запрос каждого процесса отдельно
+попадает в foodgram_worker_first_request_seconds.
+
+/metrics не проксируется nginx и отдаётся только по заголовку
+Authorization: Bearer <METRICS_TOKEN> или персоналу (сессия админки).
+"""
+import hmac
+import itertools
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+from django.utils.deprecation import MiddlewareMixin
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+QUERY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1
+)
+
+REQUESTS = Counter(
+    'foodgram_requests_total',
+    'HTTP-запросы по обработчику, методу и статусу ответа.',
+    ['view', 'method', 'status'],
+)
+REQUEST_SECONDS = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    ['view', 'method'],
+)
+RESPONSE_BYTES = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа (после сжатия).',
+    ['view'],
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries',
+    'Число SQL-запросов за HTTP-запрос.',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    'foodgram_request_query_duration_seconds',
+    'Суммарное время SQL-запросов за HTTP-запрос.',
+    ['view'],
+)
+IN_PROGRESS = Gauge(
+    'foodgram_requests_in_progress',
+    'Запросы, которые обрабатываются сейчас, по всем воркерам.',
+    multiprocess_mode='livesum',
+)
+QUERY_SECONDS = Histogram(
+    'foodgram_db_query_duration_seconds',
+    'Время SQL-запроса.',
+    ['database'],
+    buckets=QUERY_BUCKETS,
+)
+DB_CONNECTIONS = Counter(
+    'foodgram_db_connections_total',
+    'Открытые соединения с базой.',
+    ['database'],
+)
+DB_CONNECT_SECONDS = Histogram(
+    'foodgram_db_connect_duration_seconds',
+    'Время открытия соединения с базой.',
+    ['database'],
+    buckets=QUERY_BUCKETS,
+)
+DB_CONNECTIONS_REUSED = Counter(
+    'foodgram_db_connections_reused_total',
+    'Запросы, получившие уже открытое соединение.',
+    ['database'],
+)
+DB_HEALTH_CHECK_FAILURES = Counter(
+    'foodgram_db_health_check_failures_total',
+    'Соединения, не прошедшие проверку перед запросом.',
+    ['database'],
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшам приложения: result - hit или miss.',
+    ['cache', 'result'],
+)
+WORKER_START_SECONDS = Gauge(
+    'foodgram_worker_start_seconds',
+    'Запуск воркера: stage=load - загрузка приложения (с preload_app - '
+    'в главном процессе), warm_up - прогрев (foodgram.warmup).',
+    ['stage'],
+    multiprocess_mode='livemax',
+)
+FIRST_REQUEST_SECONDS = Histogram(
+    'foodgram_worker_first_request_seconds',
+    'Время первого запроса, обработанного воркером.',
+)
+
+# [число запросов, время] SQL текущего HTTP-запроса
+request_queries = ContextVar('request_queries', default=None)
+# номер ответа в процессе, первый отмечается отдельно
+_responses = itertools.count()
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def observe_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (connection.execute_wrappers)."""
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        QUERY_SECONDS.labels(context['connection'].alias).observe(duration)
+        current = request_queries.get()
+        if current is not None:
+            current[0] += 1
+            current[1] += duration
+
+
+def view_name(view_func, method):
+    """Метка обработчика: вьюсет и действие, класс или функция."""
+
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None
+    )
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions is None:
+        return view_class.__name__
+    return f'{view_class.__name__}.{actions.get(method.lower(), "-")}'
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        IN_PROGRESS.inc()
+        request.metrics_started = time.perf_counter()
+        request.metrics_view = '-'
+        request_queries.set([0, 0.0])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_name(view_func, request.method)
+
+    def process_response(self, request, response):
+        started = getattr(request, 'metrics_started', None)
+        if started is None:
+            return response
+        IN_PROGRESS.dec()
+        view, method = request.metrics_view, request.method
+        duration = time.perf_counter() - started
+        REQUESTS.labels(view, method, response.status_code).inc()
+        REQUEST_SECONDS.labels(view, method).observe(duration)
+        if next(_responses) == 0:
+            FIRST_REQUEST_SECONDS.observe(duration)
+        if not response.streaming:
+            RESPONSE_BYTES.labels(view).observe(len(response.content))
+        queries = request_queries.get()
+        if queries is not None:
+            REQUEST_QUERIES.labels(view).observe(queries[0])
+            REQUEST_QUERY_SECONDS.labels(view).observe(queries[1])
+            request_queries.set(None)
+        return response
+
+
+def allowed(request):
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def metrics_view(request):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+
+    if not allowed(request):
+        # не раскрываем, что адрес существует
+        return HttpResponseNotFound()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
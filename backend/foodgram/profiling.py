@@ -0,0 +1,263 @@
+"""
+Профилирование отдельных запросов в production.
+
+Сотрудник (is_staff) включает профилирование заголовком X-Profile: 1
+или параметром ?profile=1; параметр убирается из запроса до view, чтобы
+профилировался тот же путь, что и без него. На время такого запроса
+запускаются:
+    - поток, который раз в PROFILE_INTERVAL_MS снимает стеки Python
+      всех потоков процесса (sys._current_frames) - статистический
+      профиль почти не замедляет запрос, в отличие от cProfile;
+      простаивающие потоки (ожидание в threading, queue, selectors,
+      пуле потоков) пропускаются, а в воркере с несколькими потоками в профиль
+      попадут и соседние запросы;
+    - tracemalloc: пик памяти за запрос и строки, где выделено больше
+      всего;
+    - запись SQL-запросов с их временем (record_query, его подключают
+      обёртки соединений из foodgram.backends).
+
+В процессе одновременно профилируется один запрос: остальные в это
+время выполняются как обычно. Результат пишется в PROFILE_DIR:
+<имя>.collapsed - стеки в формате collapsed (строка "a;b;c число"),
+из которого flamegraph.pl или speedscope строят flame graph, и
+<имя>.json - сведения о запросе, SQL и память. Хранятся последние
+PROFILE_KEEP профилей; имя профиля возвращается в заголовке X-Profile.
+Посмотреть профили - manage.py show_profiles.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+# модули, в которых ждут простаивающие потоки
+IDLE_FILES = tuple(
+    os.path.join(os.sep, *path)
+    for path in (
+        ('threading.py',),
+        ('queue.py',),
+        ('selectors.py',),
+        ('concurrent', 'futures', 'thread.py'),
+    )
+)
+TRACEMALLOC_FRAMES = 5
+TOP_ALLOCATIONS = 20
+MAX_QUERIES = 500
+
+# SQL текущего профилируемого запроса: [(sql, секунды)]
+profiled_queries = ContextVar('profiled_queries', default=None)
+_profiling = threading.Lock()
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (connection.execute_wrappers)."""
+
+    queries = profiled_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((sql, time.perf_counter() - started))
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return (
+        f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+        f'{code.co_firstlineno})'
+    )
+
+
+def collapse(frame):
+    """Стек от внешнего вызова к внутреннему через ";"."""
+
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Снимает стеки потоков процесса через равные промежутки."""
+
+    def __init__(self, interval):
+        super().__init__(name='profiler', daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(
+                    IDLE_FILES
+                ):
+                    continue
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def is_staff(request):
+    """Сотрудник по сессии (админка) или по токену API."""
+
+    if getattr(request, 'user', None) is not None and request.user.is_staff:
+        return True
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def wants_profile(request):
+    return (
+        request.headers.get(PROFILE_HEADER) == '1'
+        or request.GET.get(PROFILE_PARAM) == '1'
+    ) and is_staff(request)
+
+
+class Profile:
+    """Профиль одного запроса: стеки, SQL и память."""
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = []
+        profiled_queries.set(self.queries)
+        self.tracing = tracemalloc.is_tracing()
+        if not self.tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self.memory = tracemalloc.get_traced_memory()[0]
+        self.sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+        self.started = time.perf_counter()
+        self.sampler.start()
+
+    def finish(self, response):
+        """Останавливает профилирование и сохраняет результат."""
+
+        self.sampler.stop()
+        duration = time.perf_counter() - self.started
+        profiled_queries.set(None)
+        peak = tracemalloc.get_traced_memory()[1] - self.memory
+        allocations = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )).statistics('lineno')[:TOP_ALLOCATIONS]
+        if not self.tracing:
+            tracemalloc.stop()
+
+        name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}'
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, name)
+        with open(f'{path}.collapsed', 'w') as file:
+            for stack, count in self.sampler.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        with open(f'{path}.json', 'w') as file:
+            json.dump({
+                'method': self.request.method,
+                'path': self.request.get_full_path(),
+                'status': response.status_code,
+                'duration': duration,
+                'interval': self.sampler.interval,
+                'samples': self.sampler.samples,
+                'queries': [
+                    {'sql': sql, 'duration': seconds}
+                    for sql, seconds in self.queries[:MAX_QUERIES]
+                ],
+                'query_count': len(self.queries),
+                'memory_peak': peak,
+                'allocations': [
+                    {
+                        'line': str(statistic.traceback[0]),
+                        'size': statistic.size,
+                        'count': statistic.count,
+                    }
+                    for statistic in allocations
+                ],
+            }, file, ensure_ascii=False, indent=2)
+        remove_old_profiles()
+        return name
+
+
+def profile_names():
+    """Имена сохранённых профилей от старых к новым."""
+
+    try:
+        files = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        file[:-len('.json')] for file in files if file.endswith('.json')
+    )
+
+
+def remove_old_profiles():
+    names = profile_names()
+    for name in names[:max(len(names) - settings.PROFILE_KEEP, 0)]:
+        for suffix in ('.json', '.collapsed'):
+            try:
+                os.remove(os.path.join(settings.PROFILE_DIR, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def strip_profile_param(request):
+    """
+    Убирает ?profile= из запроса: view и кэши должны видеть тот же
+    запрос, что и без профилирования.
+    """
+
+    if PROFILE_PARAM not in request.GET:
+        return
+    query = request.GET.copy()
+    del query[PROFILE_PARAM]
+    query._mutable = False
+    request.GET = query
+    request.META['QUERY_STRING'] = query.urlencode()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Профилирует запрос сотрудника с X-Profile: 1 или ?profile=1."""
+
+    def process_request(self, request):
+        if not wants_profile(request):
+            return
+        strip_profile_param(request)
+        if _profiling.acquire(blocking=False):
+            try:
+                request.profile = Profile(request)
+            except Exception:
+                _profiling.release()
+                raise
+
+    def process_response(self, request, response):
+        profile = getattr(request, 'profile', None)
+        if profile is None:
+            return response
+        try:
+            response[PROFILE_HEADER] = profile.finish(response)
+        finally:
+            del request.profile
+            _profiling.release()
+        return response
@@ -0,0 +1,80 @@
+"""
+Маршрутизация чтения на реплику базы данных.
+
+Реплика используется только там, где это явно разрешено: вьюсеты с
+api.mixins.ReplicaReadMixin включают её на время безопасного (GET)
+запроса. Запись, транзакции, management-команды и всё остальное
+работают с основной базой. После успешного изменяющего запроса
+клиент на REPLICA_PIN_SECONDS закрепляется за основной базой
+(cookie от ReplicaPinMiddleware), чтобы сразу видеть свои изменения.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework.permissions import SAFE_METHODS
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = 'pin_primary'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def use_replica(request):
+    """Можно ли читать данные для запроса <request> с реплики."""
+
+    return (
+        settings.REPLICA_DATABASE in settings.DATABASES
+        and request.method in SAFE_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Направляет чтение внутри блока на реплику."""
+
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            replica_reads.get()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+            and settings.REPLICA_DATABASE in settings.DATABASES
+        ):
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика содержит те же данные, что и основная база
+        return True
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """Закрепляет клиента за основной базой после изменений."""
+
+    def process_response(self, request, response):
+        if (
+            settings.REPLICA_DATABASE in settings.DATABASES
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -23,17 +23,23 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
+    'sync.apps.SyncConfig',
+    'jobs.apps.JobsConfig',
     'colorfield',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.routers.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -56,17 +62,72 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные обработчики чтения (api.async_views) для запуска через ASGI
+ASYNC_API = os.getenv('ASYNC_API', 'False') == 'True'
+
+# События о новых рецептах (foodgram.events, поток /api/events/ в ASGI)
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'foodgram.events.InMemoryBroker')
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+
+# Соединения с базой, см. foodgram.connections. Каждый поток воркера
+# держит своё соединение с каждой базой (default и replica), поэтому
+# соединений не больше, чем воркеров gunicorn × потоков в воркере на
+# каждую базу; если это больше max_connections PostgreSQL, ставится
+# PgBouncer в режиме transaction и DB_PGBOUNCER=True. В этом режиме
+# серверные курсоры (QuerySet.iterator()) не переживают транзакцию и
+# отключаются; psycopg2 не использует серверные подготовленные
+# выражения, а часовой пояс соединения лучше задать для роли в базе
+# (ALTER ROLE ... SET timezone = 'UTC'), чтобы Django не менял его SET.
+DB_CONNECTION = {
+    'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_PGBOUNCER', 'False') == 'True',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+        },
+        **DB_CONNECTION,
     }
 }
 
+if os.getenv('DB_ENGINE') == 'sqlite3':
+    # локальная разработка
+    DATABASES['default'] = {
+        'ENGINE': 'foodgram.backends.sqlite3',
+        'NAME': BASE_DIR / os.getenv('SQLITE_NAME', 'db.sqlite3'),
+        **DB_CONNECTION,
+    }
+
+# Реплика для чтения, см. foodgram.routers. Для локальной проверки на
+# SQLite достаточно указать DB_REPLICA_NAME=db_replica.sqlite3
+REPLICA_DATABASE = 'replica'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES['default']['ENGINE'].endswith('sqlite3') and os.getenv('DB_REPLICA_NAME'):
+        DATABASES[REPLICA_DATABASE]['NAME'] = BASE_DIR / os.getenv('DB_REPLICA_NAME')
+
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
 AUTH_USER_MODEL = 'users.Profile'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,8 +173,43 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Сжатие ответов, см. foodgram.compression
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+
+# Метрики Prometheus, см. foodgram.metrics. Под gunicorn нужен также
+# каталог PROMETHEUS_MULTIPROC_DIR (его готовит gunicorn.conf.py)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Профилирование запросов сотрудников, см. foodgram.profiling
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(BASE_DIR / 'var' / 'profiles'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+
+# Микрокэш API в gateway, см. foodgram.gateway: служебный адрес gateway
+# (пусто - не обновлять) и хосты, под которыми клиенты открывают сайт
+GATEWAY_CACHE_URL = os.getenv('GATEWAY_CACHE_URL', '')
+GATEWAY_CACHE_HOSTS = os.getenv(
+    'GATEWAY_CACHE_HOSTS', ','.join(ALLOWED_HOSTS)
+).split(',')
+
+# Индекс похожих рецептов, см. recipes.similarity
+SIMILARITY_INDEX_PATH = os.getenv(
+    'SIMILARITY_INDEX_PATH', str(BASE_DIR / 'var' / 'similarity.idx')
+)
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "HIDE_USERS": False,
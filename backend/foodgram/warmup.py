@@ -0,0 +1,96 @@
+"""
+Прогрев приложения до первого запроса.
+
+Без прогрева первые запросы каждого воркера медленные: Django и DRF
+лениво импортируют классы из настроек, компилируют регулярные
+выражения URL, загружают переводы, а кэши справочников пусты.
+warm_up() делает это заранее. В gunicorn (см. gunicorn.conf.py) с
+preload_app прогрев выполняется один раз в главном процессе до
+запуска воркеров: воркеры получают готовые объекты через fork и делят
+их страницы памяти с главным процессом (copy-on-write).
+
+Прогрев не выполняет HTTP-запросов и не проходит через middleware,
+поэтому не попадает в метрики запросов.
+"""
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+
+# модули, которые загружаются только при первом запросе
+HOT_MODULES = (
+    'api.renderers',
+    'api.serializers',
+    'api.views',
+    'djoser.serializers',
+    'djoser.views',
+    'rest_framework.negotiation',
+    'rest_framework.parsers',
+    'rest_framework.renderers',
+)
+# настройки DRF, классы из которых импортируются при первом обращении
+DRF_SETTINGS = (
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+    'DEFAULT_FILTER_BACKENDS',
+    'DEFAULT_PAGINATION_CLASS',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_RENDERER_CLASSES',
+)
+
+# время запуска процесса в секундах: load - загрузка приложения,
+# warm_up - прогрев; воркеры gunicorn наследуют его от главного процесса
+stages = {}
+
+
+def import_hot_modules():
+    from rest_framework.settings import api_settings
+
+    for module in HOT_MODULES:
+        import_module(module)
+    for name in DRF_SETTINGS:
+        getattr(api_settings, name)
+    # переводы сообщений Django и DRF
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('This field is required.')
+
+
+def compile_patterns(resolver):
+    """Компилирует регулярные выражения всех URL."""
+
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            compile_patterns(pattern)
+
+
+def compile_urls():
+    resolver = get_resolver()
+    compile_patterns(resolver)
+    # таблицы для reverse() строятся при первом обращении
+    resolver.reverse_dict
+
+
+def load_catalogs():
+    """Загружает справочники, которые кэшируются в памяти процесса."""
+
+    from recipes.cooccurrence import get_suggestions
+    from recipes.models import Tag
+
+    Tag.objects.slug_ids()
+    get_suggestions()
+
+
+def warm_up():
+    """Выполняет прогрев и возвращает время каждого шага в секундах."""
+
+    timings = {}
+    for step in (import_hot_modules, compile_urls, load_catalogs):
+        started = time.perf_counter()
+        step()
+        timings[step.__name__] = time.perf_counter() - started
+    stages['warm_up'] = sum(timings.values())
+    return timings
@@ -0,0 +1,108 @@
+"""
+Настройки gunicorn (читаются из текущего каталога автоматически).
+
+Приложение загружается в главном процессе (preload_app) и
+прогревается (foodgram.warmup) до запуска воркеров: воркеры
+получают импортированные модули, URL и справочники через fork, а не
+загружают их каждый заново. Перед fork закрываются соединения с
+базой, а gc.freeze() убирает загруженные объекты из сборки мусора,
+чтобы сборщик в воркерах не менял их страницы памяти и они оставались
+общими с главным процессом (copy-on-write). С GUNICORN_PRELOAD=False
+каждый воркер загружает и прогревает приложение сам, зато по HUP
+перезагружается код.
+
+Воркер перезапускается после GUNICORN_MAX_REQUESTS запросов
+(накопленная память возвращается системе); случайная добавка
+max_requests_jitter разносит перезапуски воркеров во времени.
+
+Время загрузки и прогрева пишется в лог и в метрику
+foodgram_worker_start_seconds (foodgram.metrics).
+
+Метрики воркеров (foodgram.metrics) складываются в каталог
+PROMETHEUS_MULTIPROC_DIR: он очищается при старте сервера, а файлы
+умершего воркера помечаются, чтобы его запросы "в работе" не
+учитывались.
+"""
+import gc
+import multiprocessing
+import os
+import shutil
+import time
+
+# gunicorn загружает приложение сразу после чтения настроек
+config_loaded = time.perf_counter()
+
+ASYNC_API = os.getenv('ASYNC_API', 'False') == 'True'
+
+bind = '0.0.0.0:8000'
+# ASYNC_API=True запускает ASGI-приложение с асинхронными обработчиками
+wsgi_app = f'foodgram.{"asgi" if ASYNC_API else "wsgi"}:application'
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+if ASYNC_API:
+    worker_class = 'uvicorn.workers.UvicornWorker'
+elif threads > 1:
+    worker_class = 'gthread'
+else:
+    worker_class = 'sync'
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def warm_up(log):
+    from foodgram.warmup import warm_up
+
+    timings = warm_up()
+    log.info('Прогрев: %s', ', '.join(
+        f'{step} {seconds * 1000:.0f} мс' for step, seconds in timings.items()
+    ))
+
+
+def on_starting(server):
+    if server.cfg.preload_app:
+        from foodgram.warmup import stages
+
+        from django.db import connections
+
+        stages['load'] = time.perf_counter() - config_loaded
+        server.log.info(
+            'Приложение загружено за %.0f мс', stages['load'] * 1000
+        )
+        warm_up(server.log)
+        connections.close_all()
+        gc.freeze()
+
+    # после прогрева: файлы метрик главного процесса не нужны
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def post_fork(server, worker):
+    worker.forked = time.perf_counter()
+
+
+def post_worker_init(worker):
+    from foodgram.metrics import WORKER_START_SECONDS
+    from foodgram.warmup import stages
+
+    if not worker.cfg.preload_app:
+        stages['load'] = time.perf_counter() - worker.forked
+        worker.log.info(
+            'Воркер %s загрузил приложение за %.0f мс',
+            worker.pid, stages['load'] * 1000,
+        )
+        warm_up(worker.log)
+    for stage, seconds in stages.items():
+        WORKER_START_SECONDS.labels(stage).set(seconds)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
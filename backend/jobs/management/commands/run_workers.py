@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from jobs.queue import delete_finished, work
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# как часто главный процесс удаляет старые выполненные задачи
+CLEANUP_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркеры фоновых задач (см. jobs.queue). Воркеры '
+        'завершают начатые задачи и выходят по SIGTERM или Ctrl+C.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Воркеры - процессы, а не потоки (для задач, которые '
+                 'нагружают CPU).',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выйти, когда задач, которые пора выполнять, не осталось.',
+        )
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            # соединения родителя не должны достаться дочерним процессам
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop, start = context.Event(), context.Process
+        else:
+            stop, start = threading.Event(), threading.Thread
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        workers = [
+            start(
+                target=work,
+                args=(f'{prefix}:{number}', stop, options['burst']),
+                name=f'worker-{number}',
+            )
+            for number in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+        print(
+            f'Воркеров: {len(workers)} '
+            f'({"процессы" if options["processes"] else "потоки"})'
+        )
+
+        cleaned_at = 0
+        while any(worker.is_alive() for worker in workers):
+            if time.monotonic() - cleaned_at > CLEANUP_SECONDS:
+                cleaned_at = time.monotonic()
+                print(f'Удалено выполненных задач: {delete_finished()}')
+                connections.close_all()
+            for worker in workers:
+                worker.join(timeout=1)
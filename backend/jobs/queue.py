@@ -0,0 +1,167 @@
+"""
+Очередь фоновых задач в базе данных, без внешнего брокера.
+
+Задача - функция с декоратором @task. enqueue(func, kwargs) ставит её
+в очередь после фиксации текущей транзакции (transaction.on_commit):
+задача не появится, если изменения откатились, и увидит всё, что
+записал запрос. Аргументы должны сериализоваться в JSON.
+
+Воркеры (manage.py run_workers) забирают задачи так:
+    PostgreSQL - SELECT ... FOR UPDATE SKIP LOCKED: строки, которые
+        уже забирает другой воркер, пропускаются, и воркеры не ждут
+        друг друга;
+    SQLite - блокировок строк нет, поэтому задача захватывается
+        условным UPDATE ... WHERE id = ? AND status = ? AND attempts = ?,
+        который из нескольких воркеров выполнит только один.
+Захваченная задача занята до locked_until: если воркер пропал, после
+этого срока её возьмёт другой. Если задача упала, она повторяется
+через JOB_RETRY_DELAY_SECONDS, с каждой попыткой пауза удваивается (не
+больше JOB_RETRY_MAX_DELAY_SECONDS); после max_attempts попыток задача
+считается неудачной. Задача может выполниться больше одного раза
+(воркер пропал после её выполнения), поэтому должна быть идемпотентной.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+import foodgram.constants as var
+from jobs.models import Job
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Делает функцию фоновой задачей, см. enqueue()."""
+
+    func.is_task = True
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    return func
+
+
+def enqueue(func, kwargs=None, delay=0):
+    """
+    Ставит задачу <func>(**kwargs) в очередь после фиксации текущей
+    транзакции; выполнить её можно не раньше чем через <delay> секунд.
+    """
+
+    job = Job(
+        name=func.task_name,
+        kwargs=kwargs or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    transaction.on_commit(job.save)
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: удваивается, со случайным разбросом."""
+
+    delay = min(
+        var.JOB_RETRY_DELAY_SECONDS * 2 ** (attempts - 1),
+        var.JOB_RETRY_MAX_DELAY_SECONDS,
+    )
+    # воркеры не повторяют одновременно задачи, упавшие вместе
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def due_jobs(now):
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now),
+        status__in=(Job.QUEUED, Job.RUNNING),
+    ).order_by('run_at', 'id')
+
+
+def claim(worker, limit=1):
+    """Забирает до <limit> задач, которые пора выполнять."""
+
+    now = timezone.now()
+    claimed = {
+        'status': Job.RUNNING,
+        'attempts': F('attempts') + 1,
+        'locked_until': now + timedelta(seconds=var.JOB_TIMEOUT_SECONDS),
+        'worker': worker[:100],
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due_jobs(now).select_for_update(
+                skip_locked=True
+            ).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**claimed)
+    else:
+        ids = [
+            job['id']
+            for job in due_jobs(now).values('id', 'status', 'attempts')[
+                :limit
+            ]
+            if Job.objects.filter(**job).update(**claimed)
+        ]
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Выполняет захваченную задачу и записывает результат."""
+
+    mine = Job.objects.filter(id=job.id, attempts=job.attempts)
+    try:
+        if job.attempts > job.max_attempts:
+            # воркеры пропадали с задачей больше max_attempts раз
+            raise RuntimeError('Превышено число попыток.')
+        func = import_string(job.name)
+        if not getattr(func, 'is_task', False):
+            raise ImportError(f'{job.name} не фоновая задача.')
+        func(**job.kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', job)
+        if job.attempts >= job.max_attempts:
+            mine.update(
+                status=Job.FAILED,
+                error=traceback.format_exc(),
+                finished_at=timezone.now(),
+            )
+        else:
+            mine.update(
+                status=Job.QUEUED,
+                error=traceback.format_exc(),
+                run_at=timezone.now() + retry_delay(job.attempts),
+            )
+        return False
+    mine.update(status=Job.DONE, finished_at=timezone.now())
+    return True
+
+
+def work(worker, stop, burst=False):
+    """
+    Цикл воркера: выполняет задачи, пока не установлено событие <stop>.
+    С <burst> выходит, когда задач, которые пора выполнять, не осталось.
+    """
+
+    try:
+        while not stop.is_set():
+            # как между HTTP-запросами: старые и сломанные соединения
+            # закрываются
+            close_old_connections()
+            jobs = claim(worker)
+            if not jobs:
+                if burst:
+                    return
+                stop.wait(var.JOB_POLL_SECONDS)
+            for job in jobs:
+                run_job(job)
+    finally:
+        connection.close()
+
+
+def delete_finished():
+    """Удаляет задачи, выполненные больше JOB_KEEP_DAYS дней назад."""
+
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(days=var.JOB_KEEP_DAYS),
+    ).delete()
+    return deleted
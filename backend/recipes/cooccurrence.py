@@ -0,0 +1,242 @@
+"""
+Подсказки ингредиентов для редактора рецептов.
+
+IngredientPair хранит, в скольких рецептах встречается каждая пара
+ингредиентов. Таблица обновляется командой refresh_cooccurrence по
+разнице: пересчитываются только рецепты, чья версия (Recipe.version)
+изменилась с прошлого запуска, - их старые пары вычитаются, новые
+прибавляются. Первый запуск проходит по AmountIngredients один раз.
+
+Близость ингредиентов - PMI (pointwise mutual information):
+    log(n(a, b) * N / (n(a) * n(b))),
+где N - число рецептов с ингредиентами, n(a) - рецептов с a, n(a, b) -
+рецептов с обоими. PMI показывает, насколько чаще ингредиенты
+встречаются вместе, чем встречались бы случайно. Для каждого
+ингредиента в памяти процесса держатся COOCCURRENCE_TOP_K соседей с
+наибольшим положительным PMI; данные перечитываются из базы не чаще
+раза в COOCCURRENCE_RELOAD_SECONDS.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nlargest
+from itertools import permutations
+
+import foodgram.constants as var
+from foodgram.metrics import cache_result
+from recipes.models import (
+    AmountIngredients,
+    CooccurrenceSnapshot,
+    Ingredient,
+    IngredientPair,
+    Recipe
+)
+
+from django.db import transaction
+
+# кусок списка id для запросов с IN
+CHUNK_SIZE = 1000
+
+
+def pairs(ingredient_ids):
+    """Пары (a, b) в обе стороны и (a, a) для каждого ингредиента."""
+
+    yield from ((pk, pk) for pk in ingredient_ids)
+    yield from permutations(ingredient_ids, 2)
+
+
+def load_ingredients(recipe_ids):
+    """Множества ингредиентов рецептов <recipe_ids>."""
+
+    ingredients = defaultdict(set)
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        for recipe_id, ingredient_id in AmountIngredients.objects.filter(
+            recipe__in=recipe_ids[start:start + CHUNK_SIZE]
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+    return ingredients
+
+
+def apply_delta(delta):
+    """Прибавляет <delta> {(a, b): изменение} к IngredientPair."""
+
+    ingredient_ids = sorted({a for a, _ in delta})
+    existing = {}
+    for start in range(0, len(ingredient_ids), CHUNK_SIZE):
+        for pair in IngredientPair.objects.filter(
+            ingredient__in=ingredient_ids[start:start + CHUNK_SIZE]
+        ):
+            existing[pair.ingredient_id, pair.other_id] = pair
+    changed, created, empty = [], [], []
+    for (a, b), change in delta.items():
+        pair = existing.get((a, b))
+        if pair is None:
+            # пары удалённого ингредиента уже удалены каскадом
+            if change > 0:
+                created.append(IngredientPair(
+                    ingredient_id=a, other_id=b, recipes=change
+                ))
+            continue
+        pair.recipes = max(pair.recipes + change, 0)
+        (changed if pair.recipes else empty).append(pair)
+    IngredientPair.objects.bulk_update(changed, ['recipes'], batch_size=1000)
+    IngredientPair.objects.bulk_create(created, batch_size=1000)
+    IngredientPair.objects.filter(id__in=[pair.id for pair in empty]).delete()
+
+
+def refresh():
+    """
+    Обновляет IngredientPair по рецептам, изменённым с прошлого
+    запуска. Возвращает число пересчитанных рецептов.
+    """
+
+    snapshots = {
+        recipe_id: (version, ingredients)
+        for recipe_id, version, ingredients
+        in CooccurrenceSnapshot.objects.values_list(
+            'recipe_id', 'version', 'ingredients'
+        ).iterator()
+    }
+    versions = dict(Recipe.objects.values_list('id', 'version'))
+    stale = [
+        recipe_id for recipe_id, version in versions.items()
+        if snapshots.get(recipe_id, (None,))[0] != version
+    ]
+    removed = [
+        recipe_id for recipe_id in snapshots if recipe_id not in versions
+    ]
+    current = load_ingredients(stale)
+
+    delta = Counter()
+    for recipe_id in (*stale, *removed):
+        old = snapshots.get(recipe_id, (None, ''))[1]
+        old = {int(pk) for pk in old.split(',')} if old else set()
+        new = current.get(recipe_id, set())
+        if old == new:
+            continue
+        delta.subtract(pairs(old))
+        delta.update(pairs(new))
+
+    with transaction.atomic():
+        apply_delta({pair: change for pair, change in delta.items() if change})
+        CooccurrenceSnapshot.objects.filter(
+            recipe_id__in=[*stale, *removed]
+        ).delete()
+        CooccurrenceSnapshot.objects.bulk_create(
+            (
+                CooccurrenceSnapshot(
+                    recipe_id=recipe_id,
+                    version=versions[recipe_id],
+                    ingredients=','.join(
+                        map(str, sorted(current.get(recipe_id, ())))
+                    ),
+                )
+                for recipe_id in stale
+            ),
+            batch_size=1000,
+        )
+    return len(stale) + len(removed)
+
+
+class Suggestions:
+    """Соседи ингредиентов по PMI и имена для поиска по префиксу."""
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.ingredients = {
+            pk: {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in Ingredient.objects.order_by(
+                'name'
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+        self.names = [
+            (ingredient['name'].lower(), pk)
+            for pk, ingredient in self.ingredients.items()
+        ]
+        self.names.sort()
+
+        recipes = CooccurrenceSnapshot.objects.exclude(ingredients='').count()
+        counts, together = {}, defaultdict(list)
+        for a, b, count in IngredientPair.objects.values_list(
+            'ingredient_id', 'other_id', 'recipes'
+        ).iterator():
+            if a == b:
+                counts[a] = count
+            elif count >= var.COOCCURRENCE_MIN_RECIPES:
+                together[a].append((b, count))
+        self.neighbours = {}
+        for a, others in together.items():
+            scores = (
+                (b, math.log(count * recipes / (counts[a] * counts[b])))
+                for b, count in others
+                if counts.get(a) and counts.get(b)
+            )
+            self.neighbours[a] = nlargest(
+                var.COOCCURRENCE_TOP_K,
+                ((b, score) for b, score in scores if score > 0),
+                key=lambda item: item[1],
+            )
+
+    def prefixed(self, prefix):
+        """id ингредиентов, чьё название начинается с <prefix>, по имени."""
+
+        prefix = prefix.lower()
+        position = bisect_left(self.names, (prefix,))
+        while (
+            position < len(self.names)
+            and self.names[position][0].startswith(prefix)
+        ):
+            yield self.names[position][1]
+            position += 1
+
+    def suggest(self, prefix, ingredient_ids, limit):
+        """
+        До <limit> ингредиентов с названием на <prefix>: сначала
+        соседи уже выбранных <ingredient_ids> по сумме PMI, затем
+        остальные по названию.
+        """
+
+        chosen = set(ingredient_ids)
+        scores = Counter()
+        for pk in chosen:
+            for other, score in self.neighbours.get(pk, ()):
+                if other not in chosen:
+                    scores[other] += score
+        matches = set(self.prefixed(prefix)) if prefix else None
+        suggested = sorted(
+            (
+                pk for pk in scores
+                if pk in self.ingredients
+                and (matches is None or pk in matches)
+            ),
+            key=lambda pk: (-scores[pk], self.ingredients[pk]['name']),
+        )[:limit]
+        if prefix and len(suggested) < limit:
+            seen = chosen.union(suggested)
+            for pk in self.prefixed(prefix):
+                if pk not in seen:
+                    suggested.append(pk)
+                    if len(suggested) == limit:
+                        break
+        return [self.ingredients[pk] for pk in suggested]
+
+
+_suggestions = None
+_lock = threading.Lock()
+
+
+def get_suggestions():
+    """Подсказки текущего процесса, перечитываются по таймауту."""
+
+    global _suggestions
+    with _lock:
+        hit = _suggestions is not None and (
+            time.monotonic() - _suggestions.loaded_at
+            <= var.COOCCURRENCE_RELOAD_SECONDS
+        )
+        cache_result('ingredient_suggestions', hit)
+        if not hit:
+            _suggestions = Suggestions()
+        return _suggestions
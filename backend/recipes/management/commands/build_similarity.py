@@ -0,0 +1,23 @@
+from recipes.similarity import build
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит индекс похожих рецептов. Сигнатуры пересчитываются только '
+        'для рецептов, изменившихся с прошлой сборки, поэтому команду '
+        'можно запускать часто (например, по cron раз в несколько минут).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.SIMILARITY_INDEX_PATH,
+            help='Файл индекса (по умолчанию SIMILARITY_INDEX_PATH).',
+        )
+
+    def handle(self, *args, **options):
+        total, rebuilt = build(options['path'])
+        print(f'Рецептов в индексе: {total}, пересчитано: {rebuilt}')
@@ -0,0 +1,25 @@
+from recipes.transfer import export_recipes, open_file
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с ингредиентами, тегами, автором и путём к '
+        'картинке в файл NDJSON (.gz - со сжатием), см. recipes.transfer. '
+        'Файлы картинок из MEDIA_ROOT копируются отдельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл выгрузки')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько рецептов читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        with open_file(options['path'], 'w') as file:
+            count = export_recipes(file, options['chunk_size'])
+        print(f'Выгружено рецептов: {count}')
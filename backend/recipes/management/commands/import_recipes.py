@@ -0,0 +1,39 @@
+from recipes.transfer import import_recipes, open_file
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из файла NDJSON (см. export_recipes). Рецепты, '
+        'которые уже есть (тот же автор и название), пропускаются, поэтому '
+        'прерванную загрузку можно запустить снова. Авторы, ингредиенты и '
+        'теги должны уже быть в базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл выгрузки')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько рецептов добавлять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        stats = {}
+        with open_file(options['path'], 'r') as file:
+            for stats in import_recipes(
+                file, options['batch_size'], self.skipped
+            ):
+                print(
+                    f'Строк: {stats["lines"]}, '
+                    f'добавлено: {stats["created"]}, '
+                    f'уже были: {stats["existing"]}, '
+                    f'пропущено: {stats["skipped"]}'
+                )
+        print(f'Загрузка завершена, добавлено рецептов: '
+              f'{stats.get("created", 0)}')
+
+    def skipped(self, number, reason):
+        print(f'Строка {number} пропущена: {reason}')
@@ -0,0 +1,15 @@
+from recipes.popularity import recompute
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярность рецептов заново по избранному и '
+        'спискам покупок. Обычно таблица обновляется сигналами, команда '
+        'исправляет расхождения (например, после массовых изменений в '
+        'базе в обход моделей).'
+    )
+
+    def handle(self, *args, **options):
+        print(f'Рецептов с рейтингом: {recompute()}')
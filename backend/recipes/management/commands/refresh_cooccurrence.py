@@ -0,0 +1,27 @@
+from recipes.cooccurrence import refresh
+from recipes.models import CooccurrenceSnapshot, IngredientPair
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет таблицу совместной встречаемости ингредиентов для '
+        'подсказок в редакторе рецептов. Учитываются только рецепты, '
+        'изменённые с прошлого запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать таблицу с нуля.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['full']:
+                IngredientPair.objects.all().delete()
+                CooccurrenceSnapshot.objects.all().delete()
+            print(f'Пересчитано рецептов: {refresh()}')
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:02
+
+import foodgram.cascades
+import recipes.popularity
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def recompute_popularity(apps, schema_editor):
+    recipes.popularity.recompute(apps, schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favourite',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='В избранном')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='В списках покупок')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Рейтинг за всё время')),
+                ('trending', models.FloatField(default=0, verbose_name='Текущий рейтинг')),
+            ],
+            options={
+                'verbose_name': 'популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-total', '-recipe'], name='recipes_score_total'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipes_score_trending'),
+        ),
+        migrations.RunPython(
+            foodgram.cascades.set_db_cascades(
+                'recipes', model_names=['recipescore']
+            ),
+            foodgram.cascades.set_db_cascades(
+                'recipes', enabled=False, model_names=['recipescore']
+            ),
+        ),
+        # у существующих строк дата добавления - момент миграции
+        migrations.RunPython(recompute_popularity, migrations.RunPython.noop),
+    ]
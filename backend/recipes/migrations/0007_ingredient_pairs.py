@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-19 06:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CooccurrenceSnapshot',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Рецепт')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия рецепта')),
+                ('ingredients', models.TextField(verbose_name='Ингредиенты')),
+            ],
+            options={
+                'verbose_name': 'учтённый рецепт',
+                'verbose_name_plural': 'Учтённые рецепты',
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipes', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Вместе с ингредиентом')),
+            ],
+            options={
+                'verbose_name': 'пара ингредиентов',
+                'verbose_name_plural': 'Пары ингредиентов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpair',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'other'), name='unique_ingredient_pair'),
+        ),
+    ]
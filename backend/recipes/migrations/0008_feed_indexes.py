@@ -0,0 +1,21 @@
+# Generated by Django 3.2.16 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_pairs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='amountingredients',
+            index=models.Index(fields=['recipe', 'id', 'ingredient', 'amount'], name='recipes_amount_covering'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipes_author_newest'),
+        ),
+    ]
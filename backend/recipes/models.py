@@ -1,5 +1,11 @@
+import time
+
 import foodgram.constants as var
 from colorfield.fields import ColorField
+from foodgram import gateway
+from foodgram.cascades import CascadeModel, CascadeQuerySet
+from foodgram.metrics import cache_result
+from sync.models import Change
 from users.models import User
 
 from django.core.validators import MinValueValidator
@@ -25,6 +31,33 @@ class Ingredient(models.Model):
         return self.name
 
 
+class TagManager(models.Manager):
+    """Менеджер тегов с кэшем slug -> id в памяти процесса."""
+
+    _slug_ids = None
+
+    def slug_ids(self):
+        """
+        Словарь slug -> id всех тегов. Теги меняются редко: словарь
+        перечитывается раз в TAG_CACHE_SECONDS, а в процессе, где тег
+        изменили, - сразу (см. recipes.signals).
+        """
+
+        cached = self._slug_ids
+        hit = cached is not None and time.monotonic() - cached[0] <= (
+            var.TAG_CACHE_SECONDS
+        )
+        cache_result('tag_slugs', hit)
+        if not hit:
+            cached = self._slug_ids = (
+                time.monotonic(), dict(self.values_list('slug', 'id'))
+            )
+        return cached[1]
+
+    def clear_slug_ids(self):
+        self._slug_ids = None
+
+
 class Tag(models.Model):
     name = models.CharField(
         max_length=var.TAG_MAX_NAME,
@@ -43,6 +76,8 @@ class Tag(models.Model):
         verbose_name='URL тега',
     )
 
+    objects = TagManager()
+
     class Meta:
         verbose_name = 'тег'
         verbose_name_plural = 'Теги'
@@ -51,7 +86,25 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(CascadeQuerySet):
+
+    def touch(self):
+        """
+        Новая версия рецептов, кэш представления и микрокэш gateway
+        сброшены, изменение записано в журнал синхронизации.
+        """
+
+        Change.objects.record(
+            Change.RECIPES,
+            [(None, pk) for pk in self.values_list('id', flat=True)],
+        )
+        gateway.purge_recipes(self)
+        return self.update(
+            version=models.F('version') + 1, representation=None
+        )
+
+
+class Recipe(CascadeModel):
     ingredients = models.ManyToManyField(
         Ingredient,
         through='AmountIngredients',
@@ -85,13 +138,34 @@ class Recipe(models.Model):
         User,
         verbose_name='Автор рецепта',
         related_name='recipes',
-        on_delete=models.SET_NULL,
+        # ON DELETE SET NULL выполняет СУБД, см. foodgram.cascades
+        on_delete=models.DO_NOTHING,
         null=True,
     )
     pub_date = models.DateTimeField(
         'Дата публикации рецепта',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения рецепта',
+        auto_now=True,
+    )
+    # растёт при любом изменении, которое видно в ответе API:
+    # самого рецепта, его тегов и ингредиентов, профиля автора
+    version = models.PositiveIntegerField(
+        'Версия рецепта',
+        default=1,
+        editable=False,
+    )
+    # готовое представление без полей пользователя в виде JSON-строки
+    # (jsonb не сохраняет порядок ключей), см. api.representations
+    representation = models.TextField(
+        'Кэш представления',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
@@ -102,6 +176,12 @@ class Recipe(models.Model):
                 name='unique_recipe'
             )
         ]
+        indexes = [
+            # рецепты автора от новых к старым: ?author= и подписки
+            models.Index(
+                fields=['author', '-id'], name='recipes_author_newest'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -111,22 +191,22 @@ class Recipe(models.Model):
         return super().clean()
 
     def save(self, *args, **kwargs) -> None:
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = models.F('version') + 1
+        self.representation = None
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], 'version', 'representation'
+            }
         super().save(*args, **kwargs)
-
-    def display_favourite(self):
-        query = Favourite.objects.filter(recipe_id=self.pk)
-        return query.count()
-    display_favourite.short_description = 'Количество добавлений в избранное'
-
-    def display_tags(self):
-        return ', '.join([recipe.name for recipe in self.tags.all()])
-    display_tags.short_description = 'Теги'
+        self.refresh_from_db(fields=['version'])
 
 
 class AmountIngredients(models.Model):
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='ingredient',
         verbose_name='Рецепт',
     )
@@ -146,26 +226,36 @@ class AmountIngredients(models.Model):
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Количество ингредиентов в рецептах'
+        indexes = [
+            # покрывающий: ингредиенты рецептов читаются в порядке
+            # добавления без обращения к таблице (Index Only Scan)
+            models.Index(
+                fields=['recipe', 'id', 'ingredient', 'amount'],
+                name='recipes_amount_covering',
+            ),
+        ]
 
     def __str__(self):
         return (f'Рецепт "{self.recipe}"')
 
-    def display_author(self):
-        return self.recipe.author.get_username()
-    display_author.short_description = 'Автор рецепта'
-
 
 class AbstractModel(models.Model):
+    # ON DELETE CASCADE для обоих ключей выполняет СУБД,
+    # см. foodgram.cascades
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         verbose_name='Избранный рецепт',
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+    )
 
     class Meta:
         abstract = True
@@ -204,3 +294,115 @@ class ShoppingCart(AbstractModel):
     def __str__(self):
         return (f'Пользователь {self.user} планирует купить '
                 f'ингредиенты рецепта: {self.recipe}')
+
+
+class RecipeScore(models.Model):
+    """
+    Популярность рецепта, см. recipes.popularity. Строка обновляется
+    при каждом добавлении рецепта в избранное или список покупок и
+    удалении из них; recompute_popularity пересчитывает таблицу целиком.
+    """
+
+    # ON DELETE CASCADE выполняет СУБД, см. foodgram.cascades
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+    favorites = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+    )
+    shopping_carts = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+    )
+    # взвешенная сумма за всё время
+    total = models.PositiveIntegerField(
+        'Рейтинг за всё время',
+        default=0,
+    )
+    # взвешенная сумма с затуханием, см. popularity.decay
+    trending = models.FloatField(
+        'Текущий рейтинг',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            models.Index(
+                fields=['-total', '-recipe'], name='recipes_score_total'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'], name='recipes_score_trending'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.total}'
+
+
+class IngredientPair(models.Model):
+    """
+    В скольких рецептах ингредиенты встречаются вместе, см.
+    recipes.cooccurrence. Каждая пара хранится в обе стороны, а строка
+    ingredient == other - число рецептов с самим ингредиентом.
+    """
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    other = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Вместе с ингредиентом',
+    )
+    recipes = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'пара ингредиентов'
+        verbose_name_plural = 'Пары ингредиентов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'other'],
+                name='unique_ingredient_pair'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id} + {self.other_id}: {self.recipes}'
+
+
+class CooccurrenceSnapshot(models.Model):
+    """
+    Ингредиенты рецепта, уже учтённые в IngredientPair, и версия
+    рецепта, с которой они сняты. Строка не ссылается на рецепт
+    внешним ключом: после удаления рецепта она нужна, чтобы вычесть
+    его пары.
+    """
+
+    recipe_id = models.BigIntegerField(
+        'Рецепт',
+        primary_key=True,
+    )
+    version = models.PositiveIntegerField('Версия рецепта')
+    # id ингредиентов через запятую
+    ingredients = models.TextField('Ингредиенты')
+
+    class Meta:
+        verbose_name = 'учтённый рецепт'
+        verbose_name_plural = 'Учтённые рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.ingredients}'
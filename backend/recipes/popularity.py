@@ -0,0 +1,108 @@
+"""
+Популярность рецептов для /api/recipes/popular/.
+
+Каждое добавление рецепта в избранное или список покупок даёт рецепту
+вес (POPULAR_*_WEIGHT). Рейтинг за всё время - сумма весов, текущий
+рейтинг - сумма весов, умноженных на 2 ** (возраст события в
+POPULAR_HALF_LIFE_DAYS): вклад события вдвое меньше каждые
+POPULAR_HALF_LIFE_DAYS дней.
+
+Чтобы не пересчитывать все строки с течением времени, вес события
+умножается не на убывающий множитель, а на растущий decay(created_at),
+отсчитанный от общей точки EPOCH. Отношение рейтингов двух рецептов от
+этого не меняется, поэтому порядок по RecipeScore.trending совпадает
+с порядком по затухающему рейтингу в любой момент, а удаление события
+вычитает ровно тот вклад, который когда-то был добавлен.
+
+Множитель растёт вдвое каждые POPULAR_HALF_LIFE_DAYS дней и выходит
+за пределы float примерно через 1000 таких периодов после EPOCH.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import foodgram.constants as var
+
+from django.apps import apps as global_apps
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def decay(moment):
+    """Множитель для события в момент <moment>."""
+
+    age = (moment - EPOCH).total_seconds() / 86400
+    return 2 ** (age / var.POPULAR_HALF_LIFE_DAYS)
+
+
+def weights(apps=global_apps):
+    """Модель события -> (поле RecipeScore, вес)."""
+
+    return {
+        apps.get_model('recipes', 'Favourite'): (
+            'favorites', var.POPULAR_FAVORITE_WEIGHT
+        ),
+        apps.get_model('recipes', 'ShoppingCart'): (
+            'shopping_carts', var.POPULAR_SHOPPING_CART_WEIGHT
+        ),
+    }
+
+
+def add_events(model, rows, sign=1, using=DEFAULT_DB_ALIAS):
+    """
+    Учитывает в RecipeScore события <model> (Favourite или ShoppingCart)
+    из пар (recipe_id, created_at); sign=-1 - события удалены.
+    Один UPDATE на каждый рецепт.
+    """
+
+    counter, weight = weights()[model]
+    changes = defaultdict(lambda: [0, 0.0])
+    for recipe_id, created_at in rows:
+        change = changes[recipe_id]
+        change[0] += sign
+        change[1] += sign * weight * decay(created_at)
+
+    RecipeScore = global_apps.get_model('recipes', 'RecipeScore')
+    manager = RecipeScore.objects.db_manager(using)
+    for recipe_id, (count, trending) in changes.items():
+        values = {
+            counter: F(counter) + count,
+            'total': F('total') + count * weight,
+            'trending': F('trending') + trending,
+        }
+        scores = manager.filter(recipe_id=recipe_id)
+        if not scores.update(**values):
+            # первое событие рецепта: строку мог создать и соседний запрос
+            manager.bulk_create(
+                [RecipeScore(recipe_id=recipe_id)], ignore_conflicts=True
+            )
+            scores.update(**values)
+
+
+def recompute(apps=global_apps, using=DEFAULT_DB_ALIAS):
+    """
+    Пересчитывает RecipeScore заново по всем событиям и возвращает
+    число рецептов с ненулевым рейтингом.
+    """
+
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    scores = {}
+    for model, (counter, weight) in weights(apps).items():
+        rows = model.objects.using(using).values_list(
+            'recipe_id', 'created_at'
+        )
+        for recipe_id, created_at in rows.iterator(chunk_size=10000):
+            score = scores.get(recipe_id)
+            if score is None:
+                score = scores[recipe_id] = RecipeScore(recipe_id=recipe_id)
+            setattr(score, counter, getattr(score, counter) + 1)
+            score.total += weight
+            score.trending += weight * decay(created_at)
+
+    with transaction.atomic(using=using):
+        RecipeScore.objects.using(using).all().delete()
+        RecipeScore.objects.using(using).bulk_create(
+            scores.values(), batch_size=1000
+        )
+    return len(scores)
@@ -0,0 +1,174 @@
+"""
+Сигналы рецептов: публикация событий о новых рецептах для подписчиков
+автора, новая версия рецептов (Recipe.version) при изменении тегов,
+ингредиентов и профиля автора, обновление микрокэша gateway
+(foodgram.gateway) и популярность рецептов (RecipeScore).
+"""
+import logging
+
+from foodgram import gateway
+from foodgram.cascades import cascade_delete
+from foodgram.events import get_broker
+from recipes import popularity
+from recipes.models import (
+    AmountIngredients,
+    Favourite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import User
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def recipe_event(recipe):
+    """Короткое событие: подробности клиент запросит сам, если нужно."""
+
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'image': default_storage.url(recipe.image.name)
+        if recipe.image else None,
+        'cooking_time': recipe.cooking_time,
+        'author': recipe.author_id,
+    }
+
+
+@receiver(post_save, sender=Recipe)
+def publish_new_recipe(sender, instance, created, **kwargs):
+    if not created or instance.author_id is None:
+        return
+    channel, event = author_channel(instance.author_id), recipe_event(instance)
+
+    def publish():
+        # рецепт уже сохранён: ошибка рассылки не должна ломать ответ
+        try:
+            get_broker().publish(channel, event)
+        except Exception:
+            logger.exception('Не удалось опубликовать рецепт %s', event['id'])
+
+    # подписчики узнают о рецепте, только когда он сохранён целиком
+    transaction.on_commit(publish)
+
+
+# поля профиля, которые входят в представление автора рецепта
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def purge_recipe(sender, instance, **kwargs):
+    gateway.purge(gateway.resource_paths('Recipes', [instance.id]))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag(sender, instance, **kwargs):
+    gateway.purge(gateway.resource_paths('Tags', [instance.id]))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def purge_ingredient(sender, instance, **kwargs):
+    gateway.purge(gateway.resource_paths('Ingredients', [instance.id]))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(tags=instance).touch()
+    Tag.objects.clear_slug_ids()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(post_save, sender=AmountIngredients)
+@receiver(post_delete, sender=AmountIngredients)
+def amount_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(id=instance.recipe_id).touch()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Recipe.objects.filter(id=instance.id).touch()
+    elif pk_set:
+        Recipe.objects.filter(id__in=pk_set).touch()
+    else:
+        # tag.recipes.clear(): связи уже удалены, затронутые рецепты
+        # неизвестны - сбрасываем версии всех рецептов
+        Recipe.objects.touch()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+@receiver(cascade_delete, sender=User)
+def authors_deleted(sender, pks, using, **kwargs):
+    # у рецептов удалённых пользователей пропадёт автор
+    Recipe.objects.using(using).filter(author__in=pks).touch()
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=ShoppingCart)
+def popularity_event_saved(sender, instance, created, using, **kwargs):
+    if created:
+        popularity.add_events(
+            sender, [(instance.recipe_id, instance.created_at)], using=using
+        )
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+def popularity_event_deleted(sender, instance, using, **kwargs):
+    popularity.add_events(
+        sender,
+        [(instance.recipe_id, instance.created_at)],
+        sign=-1,
+        using=using,
+    )
+
+
+@receiver(cascade_delete, sender=User)
+def popularity_events_deleted(sender, pks, using, db_cascades, **kwargs):
+    if not db_cascades:
+        # строки удалит ORM (эмуляция или delete_in_chunks), и post_delete
+        # придёт сам
+        return
+    # избранное и списки покупок пользователей удалит СУБД
+    for model in (Favourite, ShoppingCart):
+        popularity.add_events(
+            model,
+            model.objects.using(using).filter(user__in=pks).values_list(
+                'recipe_id', 'created_at'
+            ),
+            sign=-1,
+            using=using,
+        )
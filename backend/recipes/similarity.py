@@ -0,0 +1,314 @@
+"""
+Похожие рецепты для /api/recipes/<id>/similar/.
+
+Рецепт описывается множеством признаков - своих ингредиентов и тегов,
+а похожесть двух рецептов - мерой Жаккара этих множеств (доля общих
+признаков). Мера оценивается по MinHash-сигнатурам: SIMILARITY_HASHES
+минимумов независимых хэшей признаков, и доля совпавших позиций двух
+сигнатур приближает меру Жаккара. Кандидаты ищутся через LSH: сигнатура
+делится на SIMILARITY_BANDS полос, и рецепты с хотя бы одной одинаковой
+полосой попадают в кандидаты - попарно сравнивать все рецепты не нужно.
+
+Сигнатуры и таблица полос лежат в файле SIMILARITY_INDEX_PATH, который
+строит команда build_similarity. Файл открывается через mmap только для
+чтения, поэтому все воркеры gunicorn делят одну копию в кэше страниц ОС.
+Новый файл записывается рядом и подменяется атомарно, а воркеры
+переоткрывают его, когда замечают новую дату изменения.
+
+Формат файла (порядок байт - little-endian):
+    заголовок: MAGIC, FORMAT, хэшей, полос, рецептов N, записей полос M;
+    id рецептов (N × uint32, по возрастанию);
+    версии рецептов (N × uint32), см. Recipe.version;
+    сигнатуры (N × SIMILARITY_HASHES × uint32);
+    выравнивание до 8 байт;
+    ключи полос (M × uint64, по возрастанию);
+    номера рецептов для ключей полос (M × uint32).
+"""
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from hashlib import blake2b
+from operator import eq
+
+import foodgram.constants as var
+from recipes.models import AmountIngredients, Recipe
+
+from django.conf import settings
+
+MAGIC = b'RSIM'
+FORMAT = 1
+HEADER = struct.Struct('<4s5I')
+# простое число Мерсенна 2 ** 31 - 1: значения хэшей помещаются в uint32
+PRIME = (1 << 31) - 1
+# сигнатура рецепта без ингредиентов и тегов
+EMPTY = PRIME
+# кусок списка id для запросов с IN
+CHUNK_SIZE = 1000
+
+# коэффициенты хэшей (a * x + b) mod PRIME одинаковы во всех процессах
+_random = random.Random(FORMAT)
+COEFFICIENTS = tuple(
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(var.SIMILARITY_HASHES)
+)
+ROWS = var.SIMILARITY_HASHES // var.SIMILARITY_BANDS
+
+
+def features(ingredient_ids, tag_ids):
+    """Признаки рецепта: чётные - ингредиенты, нечётные - теги."""
+
+    return {2 * pk for pk in ingredient_ids} | {
+        2 * pk + 1 for pk in tag_ids
+    }
+
+
+def signature(recipe_features):
+    """MinHash-сигнатура множества признаков."""
+
+    if not recipe_features:
+        return (EMPTY,) * len(COEFFICIENTS)
+    return tuple(
+        min((a * x + b) % PRIME for x in recipe_features)
+        for a, b in COEFFICIENTS
+    )
+
+
+def band_keys(recipe_signature):
+    """Ключи полос сигнатуры; у пустой сигнатуры полос нет."""
+
+    if recipe_signature[0] == EMPTY:
+        return []
+    return [
+        int.from_bytes(blake2b(
+            struct.pack(
+                f'<{ROWS + 1}I',
+                band,
+                *recipe_signature[band * ROWS:(band + 1) * ROWS],
+            ),
+            digest_size=8,
+        ).digest(), 'little')
+        for band in range(var.SIMILARITY_BANDS)
+    ]
+
+
+def load_features(recipe_ids):
+    """Признаки рецептов <recipe_ids>: два запроса на CHUNK_SIZE рецептов."""
+
+    ingredients, tags = {}, {}
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = recipe_ids[start:start + CHUNK_SIZE]
+        for recipe_id, ingredient_id in AmountIngredients.objects.filter(
+            recipe__in=chunk
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe__in=chunk
+        ).values_list('recipe_id', 'tag_id'):
+            tags.setdefault(recipe_id, []).append(tag_id)
+    return {
+        recipe_id: features(
+            ingredients.get(recipe_id, ()), tags.get(recipe_id, ())
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class SimilarityIndex:
+    """Индекс из файла SIMILARITY_INDEX_PATH, открытый через mmap."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.mtime = os.fstat(file.fileno()).st_mtime_ns
+            self.buffer = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, version, hashes, bands, count, keys = HEADER.unpack_from(
+            self.buffer
+        )
+        if (magic, version, hashes, bands) != (
+            MAGIC, FORMAT, var.SIMILARITY_HASHES, var.SIMILARITY_BANDS
+        ):
+            raise ValueError(f'Неподходящий формат индекса {path}')
+        if sys.byteorder != 'little':
+            raise ValueError('Индекс читается только на little-endian')
+        view = memoryview(self.buffer)
+        offset = HEADER.size
+
+        def section(length, code):
+            nonlocal offset
+            size = length * array(code).itemsize
+            part = view[offset:offset + size].cast(code)
+            offset += size
+            return part
+
+        self.count = count
+        self.ids = section(count, 'I')
+        self.versions = section(count, 'I')
+        self.signatures = section(count * hashes, 'I')
+        offset += -offset % 8
+        self.keys = section(keys, 'Q')
+        self.positions = section(keys, 'I')
+
+    def position(self, recipe_id):
+        position = bisect_left(self.ids, recipe_id)
+        if position < self.count and self.ids[position] == recipe_id:
+            return position
+        return None
+
+    def signature_at(self, position):
+        hashes = var.SIMILARITY_HASHES
+        return self.signatures[position * hashes:(position + 1) * hashes]
+
+    def entries(self):
+        """Пары (id, (версия, сигнатура)) всех рецептов индекса."""
+
+        for position in range(self.count):
+            yield self.ids[position], (
+                self.versions[position],
+                tuple(self.signature_at(position)),
+            )
+
+    def similar(self, recipe_signature, limit, exclude=None):
+        """
+        До <limit> id рецептов, похожих на сигнатуру: сначала больше
+        совпавших позиций сигнатуры, при равенстве - более новые.
+        """
+
+        candidates = set()
+        for key in band_keys(recipe_signature):
+            candidates.update(self.positions[
+                bisect_left(self.keys, key):bisect_right(self.keys, key)
+            ])
+        scores = Counter()
+        for position in candidates:
+            recipe_id = self.ids[position]
+            if recipe_id != exclude:
+                scores[recipe_id] = sum(map(
+                    eq, recipe_signature, self.signature_at(position)
+                ))
+        return sorted(
+            scores, key=lambda recipe_id: (-scores[recipe_id], -recipe_id)
+        )[:limit]
+
+
+def write_index(path, entries):
+    """
+    Записывает индекс из пар (id, (версия, сигнатура)), отсортированных
+    по id, во временный файл и атомарно подменяет им <path>.
+    """
+
+    ids, versions, signatures, bands = (
+        array('I'), array('I'), array('I'), []
+    )
+    for position, (recipe_id, (version, recipe_signature)) in enumerate(
+        entries
+    ):
+        ids.append(recipe_id)
+        versions.append(version)
+        signatures.extend(recipe_signature)
+        bands.extend((key, position) for key in band_keys(recipe_signature))
+    bands.sort()
+    keys = array('Q', (key for key, _ in bands))
+    positions = array('I', (position for _, position in bands))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(
+            MAGIC, FORMAT, var.SIMILARITY_HASHES, var.SIMILARITY_BANDS,
+            len(ids), len(keys),
+        ))
+        for values in (ids, versions, signatures):
+            file.write(_little_endian(values).tobytes())
+        file.write(b'\0' * (-file.tell() % 8))
+        for values in (keys, positions):
+            file.write(_little_endian(values).tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def build(path=None):
+    """
+    Обновляет индекс: сигнатуры пересчитываются только для новых
+    рецептов и рецептов, чья версия изменилась с прошлой сборки.
+    Возвращает число рецептов в индексе и число пересчитанных.
+    """
+
+    path = path or settings.SIMILARITY_INDEX_PATH
+    try:
+        previous = dict(SimilarityIndex(path).entries())
+    except (OSError, ValueError):
+        previous = {}
+    recipes = list(
+        Recipe.objects.order_by('id').values_list('id', 'version')
+    )
+    stale = [
+        recipe_id for recipe_id, version in recipes
+        if previous.get(recipe_id, (None,))[0] != version
+    ]
+    fresh = {
+        recipe_id: signature(recipe_features)
+        for recipe_id, recipe_features in load_features(stale).items()
+    }
+    write_index(path, (
+        (recipe_id, (
+            version,
+            fresh[recipe_id] if recipe_id in fresh
+            else previous[recipe_id][1],
+        ))
+        for recipe_id, version in recipes
+    ))
+    return len(recipes), len(stale)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Индекс текущего процесса; переоткрывается, если файл подменили.
+    None - индекс ещё не построен.
+    """
+
+    global _index
+    path = settings.SIMILARITY_INDEX_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if _index is None or _index.mtime != mtime:
+            _index = SimilarityIndex(path)
+        return _index
+
+
+def similar_ids(recipe_id, version, limit):
+    """
+    id рецептов, похожих на рецепт <recipe_id> версии <version>. Если
+    рецепт изменился после сборки индекса или не попал в него, его
+    сигнатура считается на месте; кандидаты берутся из индекса.
+    """
+
+    index = get_index()
+    if index is None:
+        return []
+    position = index.position(recipe_id)
+    if position is not None and index.versions[position] == version:
+        recipe_signature = tuple(index.signature_at(position))
+    else:
+        recipe_signature = signature(load_features([recipe_id])[recipe_id])
+    return index.similar(recipe_signature, limit, exclude=recipe_id)
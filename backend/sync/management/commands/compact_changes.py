@@ -0,0 +1,15 @@
+from sync.models import Change
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из журнала изменений записи, после которых есть более '
+        'поздняя запись о том же объекте. Токены клиентов остаются '
+        'действительными: последняя запись каждого объекта сохраняется.'
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = Change.objects.superseded().delete()
+        print(f'Удалено записей: {deleted}')
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-19 06:35
+
+from django.db import migrations
+
+# (приложение, модель, вид изменения, поле пользователя, поле-ключ)
+BACKFILL = (
+    ('recipes', 'recipe', 'recipes', None, 'id'),
+    ('recipes', 'favourite', 'favorites', 'user_id', 'recipe_id'),
+    ('recipes', 'shoppingcart', 'shopping_cart', 'user_id', 'recipe_id'),
+    ('users', 'follow', 'subscriptions', 'user_id', 'following_id'),
+)
+
+
+def backfill_changes(apps, schema_editor):
+    """Записывает в журнал уже существующие объекты."""
+
+    Change = apps.get_model('sync', 'Change')
+    for app_label, model_name, kind, user_field, key_field in BACKFILL:
+        model = apps.get_model(app_label, model_name)
+        fields = (user_field, key_field) if user_field else (key_field,)
+        rows = model.objects.order_by('id').values_list(*fields).iterator()
+        Change.objects.bulk_create(
+            (
+                Change(
+                    kind=kind,
+                    user_id=row[0] if user_field else None,
+                    key=row[-1],
+                )
+                for row in rows
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_updated_at'),
+        ('users', '0002_db_cascades'),
+        ('sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
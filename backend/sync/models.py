@@ -0,0 +1,115 @@
+from users.models import User
+
+from django.db import connections, models, transaction
+from django.db.models import Exists, OuterRef, Q
+
+# ключ advisory-блокировки PostgreSQL для вставок в журнал
+JOURNAL_LOCK = 0x73796E63
+
+
+class ChangeQuerySet(models.QuerySet):
+
+    def record(self, kind, pairs, deleted=False):
+        """
+        Добавляет в журнал изменения <kind> для пар (user_id, key)
+        после фиксации текущей транзакции: запись получает номер, когда
+        изменение уже видно другим подключениям.
+        """
+
+        changes = [
+            self.model(kind=kind, user_id=user_id, key=key, deleted=deleted)
+            for user_id, key in pairs
+        ]
+        if changes:
+            transaction.on_commit(lambda: self._append(changes))
+
+    def _append(self, changes):
+        # номера выдаются при вставке, а видны записи после фиксации:
+        # без блокировки запись с меньшим номером может зафиксироваться
+        # позже, и клиент, уже получивший больший токен, её пропустит.
+        # Вставки в журнал идут по очереди, поэтому номера растут в
+        # порядке фиксации. SQLite и так допускает одного пишущего.
+        with transaction.atomic(using=self.db):
+            connection = connections[self.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT pg_advisory_xact_lock(%s)', [JOURNAL_LOCK]
+                    )
+            self.bulk_create(changes, batch_size=1000)
+
+    def visible_to(self, user):
+        """Общие изменения (рецепты) и изменения самого пользователя."""
+
+        if not user.is_authenticated:
+            return self.filter(user__isnull=True)
+        return self.filter(Q(user__isnull=True) | Q(user=user))
+
+    def superseded(self):
+        """Записи, для которых в журнале есть более поздняя запись."""
+
+        later = Change.objects.filter(
+            kind=OuterRef('kind'), key=OuterRef('key'), id__gt=OuterRef('id')
+        )
+        return self.alias(
+            has_later=Exists(later.filter(user__isnull=True)),
+            has_later_own=Exists(later.filter(user=OuterRef('user'))),
+        ).filter(
+            Q(user__isnull=True, has_later=True)
+            | Q(user__isnull=False, has_later_own=True)
+        )
+
+
+class Change(models.Model):
+    """
+    Журнал изменений для синхронизации клиентов (/api/sync/).
+    id записи - номер изменения (токен), он только растёт, и записи
+    фиксируются в порядке номеров (см. ChangeQuerySet.record). Удаления
+    хранятся как записи с deleted=True (tombstone).
+    """
+
+    RECIPES = 'recipes'
+    FAVORITES = 'favorites'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTIONS = 'subscriptions'
+    KINDS = (
+        (RECIPES, 'Рецепт'),
+        (FAVORITES, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTIONS, 'Подписка'),
+    )
+
+    kind = models.CharField(
+        max_length=16,
+        choices=KINDS,
+        verbose_name='Что изменилось',
+    )
+    # пустой пользователь - изменение видно всем (рецепты)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    # id рецепта, для подписок - id автора
+    key = models.BigIntegerField(verbose_name='Объект')
+    deleted = models.BooleanField(default=False, verbose_name='Удалён')
+    changed_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата изменения',
+    )
+
+    objects = ChangeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['kind', 'key'], name='sync_change_kind_key'),
+        ]
+
+    def __str__(self):
+        action = 'удалён' if self.deleted else 'изменён'
+        return f'{self.id}: {self.kind} {self.key} {action}'
@@ -0,0 +1,80 @@
+"""
+Запись изменений в журнал sync.Change.
+
+Рецепты, избранное, список покупок и подписки отслеживаются сигналами
+post_save/post_delete. Строки, которые при удалении рецепта или
+пользователя удаляет сама СУБД (см. foodgram.cascades), записываются
+по сигналу cascade_delete до удаления.
+"""
+from foodgram.cascades import cascade_delete
+from recipes.models import Favourite, Recipe, ShoppingCart
+from sync.models import Change
+from users.models import Follow, User
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# модель -> (вид изменения, поле-ключ)
+TRACKED = {
+    Favourite: (Change.FAVORITES, 'recipe_id'),
+    ShoppingCart: (Change.SHOPPING_CART, 'recipe_id'),
+    Follow: (Change.SUBSCRIPTIONS, 'following_id'),
+}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    Change.objects.record(Change.RECIPES, [(None, instance.id)])
+
+
+def record_user_object(instance, deleted):
+    kind, key = TRACKED[type(instance)]
+    Change.objects.record(
+        kind, [(instance.user_id, getattr(instance, key))], deleted=deleted
+    )
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def user_object_saved(sender, instance, **kwargs):
+    record_user_object(instance, deleted=False)
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def user_object_deleted(sender, instance, **kwargs):
+    record_user_object(instance, deleted=True)
+
+
+@receiver(cascade_delete, sender=Recipe)
+def recipes_deleted(sender, pks, using, **kwargs):
+    Change.objects.record(
+        Change.RECIPES, [(None, pk) for pk in pks], deleted=True
+    )
+    for model in (Favourite, ShoppingCart):
+        Change.objects.record(
+            TRACKED[model][0],
+            model.objects.using(using).filter(recipe__in=pks).values_list(
+                'user_id', 'recipe_id'
+            ),
+            deleted=True,
+        )
+
+
+@receiver(cascade_delete, sender=User)
+def users_deleted(sender, pks, using, **kwargs):
+    # подписчики теряют подписку, а у рецептов пропадает автор
+    Change.objects.record(
+        Change.SUBSCRIPTIONS,
+        Follow.objects.using(using).filter(following__in=pks).values_list(
+            'user_id', 'following_id'
+        ),
+        deleted=True,
+    )
+    Change.objects.record(Change.RECIPES, (
+        (None, pk) for pk in Recipe.objects.using(using).filter(
+            author__in=pks
+        ).values_list('id', flat=True)
+    ))
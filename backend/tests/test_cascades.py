@@ -0,0 +1,95 @@
+from unittest import mock
+
+from foodgram.cascades import delete_in_chunks
+from recipes.models import (
+    AmountIngredients,
+    Favourite,
+    Ingredient,
+    Recipe,
+    RecipeScore,
+    ShoppingCart
+)
+from users.models import User
+
+from django.test import TestCase
+
+
+class CascadeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.org', username='author', password='x'
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.org', username='reader', password='x'
+        )
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.sugar = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                name=f'Рецепт {number}', text='текст', cooking_time=10,
+                author=cls.author, image='recipes/images/test.png',
+            )
+            for number in range(3)
+        ]
+        for recipe in cls.recipes:
+            AmountIngredients.objects.create(
+                recipe=recipe, ingredient=cls.sugar, amount=1
+            )
+            Favourite.objects.create(user=cls.reader, recipe=recipe)
+        for recipe in cls.recipes[:2]:
+            AmountIngredients.objects.create(
+                recipe=recipe, ingredient=cls.salt, amount=1
+            )
+            ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+    def assertScoresEmpty(self):
+        self.assertEqual(
+            list(RecipeScore.objects.values_list(
+                'favorites', 'shopping_carts', 'total'
+            )),
+            [(0, 0, 0)] * len(self.recipes),
+        )
+
+    def test_queryset_delete_filtered_by_related_rows(self):
+        # условие ссылается на ингредиенты, которые удаляются первыми
+        Recipe.objects.filter(ingredients=self.salt).delete()
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)),
+            [self.recipes[2].id],
+        )
+        self.assertEqual(
+            Favourite.objects.filter(recipe__in=self.recipes[:2]).count(), 0
+        )
+        self.assertEqual(AmountIngredients.objects.count(), 1)
+
+    def test_delete_user_in_chunks(self):
+        delete_in_chunks(self.reader, chunk_size=1)
+
+        self.assertFalse(User.objects.filter(pk=self.reader.pk).exists())
+        self.assertFalse(Favourite.objects.exists())
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assertScoresEmpty()
+
+    def test_delete_user_in_chunks_with_db_cascades(self):
+        # популярность не должна вычитаться дважды: сигналом
+        # cascade_delete и post_delete удалённых пачек
+        with mock.patch(
+            'foodgram.cascades.supports_db_cascades', return_value=True
+        ):
+            delete_in_chunks(self.reader, chunk_size=1)
+
+        self.assertFalse(User.objects.filter(pk=self.reader.pk).exists())
+        self.assertScoresEmpty()
+
+    def test_delete_author_in_chunks(self):
+        delete_in_chunks(self.author, chunk_size=2)
+
+        self.assertEqual(
+            Recipe.objects.filter(author__isnull=True).count(),
+            len(self.recipes),
+        )
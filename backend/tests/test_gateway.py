@@ -0,0 +1,103 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+from foodgram import gateway
+from jobs.models import Job
+
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+
+@override_settings(GATEWAY_CACHE_URL='http://gateway:8081')
+class PurgeTestCase(TransactionTestCase):
+
+    def setUp(self):
+        gateway._pending.paths = None
+
+    def refresh_jobs(self):
+        return list(Job.objects.filter(
+            name=gateway.refresh.task_name
+        ).values_list('kwargs', flat=True))
+
+    def test_one_refresh_per_transaction(self):
+        with transaction.atomic():
+            gateway.purge(['/api/recipes/', '/api/recipes/1/'])
+            gateway.purge(['/api/recipes/', '/api/tags/'])
+            self.assertEqual(self.refresh_jobs(), [])
+
+        self.assertEqual(self.refresh_jobs(), [
+            {'paths': ['/api/recipes/', '/api/recipes/1/', '/api/tags/']},
+        ])
+
+    def test_nothing_after_rollback(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                gateway.purge(['/api/recipes/'])
+                1 / 0
+
+        self.assertEqual(self.refresh_jobs(), [])
+
+    @override_settings(GATEWAY_CACHE_URL='')
+    def test_disabled_without_gateway(self):
+        with transaction.atomic():
+            gateway.purge(['/api/recipes/'])
+
+        self.assertEqual(self.refresh_jobs(), [])
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Служебный порт gateway: запоминает запросы, отвечает статусом."""
+
+    def do_GET(self):
+        self.server.requests.append((
+            self.path,
+            self.headers['Host'],
+            self.headers['Accept-Encoding'],
+        ))
+        self.send_response(self.server.statuses.get(self.path, 200))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class RefreshTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        self.server.requests = []
+        self.server.statuses = {}
+        threading.Thread(target=self.server.serve_forever).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(
+            GATEWAY_CACHE_URL=f'http://127.0.0.1:{self.server.server_port}/',
+            GATEWAY_CACHE_HOSTS=['foodgram.example.org', 'localhost'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_every_host_and_encoding(self):
+        gateway.refresh(paths=['/api/recipes/', '/api/recipes/1/'])
+
+        self.assertEqual(sorted(self.server.requests), sorted(
+            (path, host, encoding)
+            for path in ('/api/recipes/', '/api/recipes/1/')
+            for host in ('foodgram.example.org', 'localhost')
+            for encoding in ('br', 'gzip', '')
+        ))
+
+    def test_not_found_replaces_entry(self):
+        self.server.statuses['/api/recipes/1/'] = 404
+
+        gateway.refresh(paths=['/api/recipes/1/'])
+
+        self.assertEqual(len(self.server.requests), 6)
+
+    def test_server_error_fails_job(self):
+        self.server.statuses['/api/recipes/'] = 502
+
+        with self.assertRaises(HTTPError):
+            gateway.refresh(paths=['/api/recipes/'])
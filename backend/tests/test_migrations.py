@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations import RunPython
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase
+
+
+def is_db_cascades(code):
+    return code.__qualname__ == 'set_db_cascades.<locals>.operation'
+
+
+class DbCascadesMigrationTestCase(SimpleTestCase):
+    """
+    Правила ON DELETE навешиваются только на PostgreSQL: здесь ветка
+    PostgreSQL выполняется на исторических состояниях моделей, без SQL.
+    """
+
+    def test_operations_match_historical_models(self):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        editor = mock.Mock(connection=connection)
+        checked = 0
+        with mock.patch(
+            'foodgram.cascades.supports_db_cascades', return_value=True
+        ), mock.patch(
+            'foodgram.cascades._constraint_sql', return_value=[]
+        ):
+            for app_label, name in loader.graph.nodes:
+                migration = loader.get_migration(app_label, name)
+                state = loader.project_state((app_label, name), at_end=False)
+                for operation in migration.operations:
+                    if isinstance(operation, RunPython) and is_db_cascades(
+                        operation.code
+                    ):
+                        with self.subTest(migration=str(migration)):
+                            operation.code(state.apps, editor)
+                            operation.reverse_code(state.apps, editor)
+                        checked += 1
+                    operation.state_forwards(app_label, state)
+        self.assertGreater(checked, 0)
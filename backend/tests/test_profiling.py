@@ -0,0 +1,36 @@
+import tempfile
+
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from django.test import TestCase, override_settings
+
+
+class ProfilingTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@example.org', username='staff', password='x',
+            is_staff=True,
+        )
+        cls.token = Token.objects.create(user=cls.staff)
+        cls.recipe = Recipe.objects.create(
+            name='Омлет', text='текст', cooking_time=10, author=cls.staff,
+            image='recipes/images/test.png',
+        )
+
+    def test_profile_param_is_not_seen_by_view(self):
+        with tempfile.TemporaryDirectory() as path:
+            with override_settings(PROFILE_DIR=path):
+                response = self.client.get(
+                    f'/api/recipes/{self.recipe.id}/',
+                    {'profile': '1'},
+                    HTTP_AUTHORIZATION=f'Token {self.token.key}',
+                )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Profile', response)
+        # без параметров рецепт отдаётся из кэша представления с ETag
+        self.assertIn('ETag', response)
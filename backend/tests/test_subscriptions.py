@@ -0,0 +1,66 @@
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class SubscriptionsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email='reader@example.org', username='reader', password='x'
+        )
+        cls.recipes = {}
+        for number, count in enumerate((5, 1)):
+            author = User.objects.create_user(
+                email=f'author{number}@example.org',
+                username=f'author{number}',
+                password='x',
+            )
+            Follow.objects.create(user=cls.reader, following=author)
+            cls.recipes[author.id] = [
+                Recipe.objects.create(
+                    name=f'Рецепт {index}', text='текст', cooking_time=10,
+                    author=author, image='recipes/images/test.png',
+                ).id
+                for index in range(count)
+            ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def subscriptions(self, **params):
+        response = self.client.get('/api/users/subscriptions/', params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            author['id']: author for author in response.json()['results']
+        }
+
+    def test_recipes_limit_returns_newest(self):
+        with CaptureQueriesContext(connection) as queries:
+            authors = self.subscriptions(recipes_limit=2)
+
+        for author_id, ids in self.recipes.items():
+            self.assertEqual(
+                [recipe['id'] for recipe in authors[author_id]['recipes']],
+                sorted(ids, reverse=True)[:2],
+            )
+            self.assertEqual(authors[author_id]['recipes_count'], len(ids))
+        # лишние рецепты отбрасывает база
+        self.assertTrue(any(
+            'ROW_NUMBER()' in query['sql'] for query in queries
+        ))
+
+    def test_without_limit_returns_all(self):
+        authors = self.subscriptions()
+
+        for author_id, ids in self.recipes.items():
+            self.assertEqual(
+                [recipe['id'] for recipe in authors[author_id]['recipes']],
+                sorted(ids, reverse=True),
+            )
@@ -0,0 +1,53 @@
+from recipes.models import Recipe, Tag
+from sync.models import Change
+from users.models import User
+
+from django.test import TestCase
+
+
+class SyncTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.org', username='author', password='x'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.recipe = Recipe.objects.create(
+            name='Омлет', text='текст', cooking_time=10, author=cls.author,
+            image='recipes/images/test.png',
+        )
+        cls.recipe.tags.add(cls.tag)
+
+    def since(self, token):
+        response = self.client.get('/api/sync/', {'since': token})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_tag_rename_returns_recipe(self):
+        token = self.since(0)['token']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Поздний завтрак'
+            self.tag.save()
+
+        data = self.since(token)
+
+        [recipe] = data['recipes']['updated']
+        self.assertEqual(recipe['id'], self.recipe.id)
+        self.assertEqual(recipe['tags'][0]['name'], 'Поздний завтрак')
+
+    def test_author_profile_change_returns_recipe(self):
+        token = self.since(0)['token']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Иван'
+            self.author.save()
+
+        data = self.since(token)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in data['recipes']['updated']],
+            [self.recipe.id],
+        )
+        self.assertTrue(
+            Change.objects.filter(id__gt=token, key=self.recipe.id).exists()
+        )
@@ -0,0 +1,41 @@
+from jobs.models import Job
+from rest_framework.test import APIClient
+from users.models import User
+
+from django.test import TestCase
+
+
+class DeleteUserTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.org', username='user', password='secret-42',
+            first_name='Иван', last_name='Иванов',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_deleted_user_is_hidden_until_job_runs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                f'/api/users/{self.user.id}/',
+                {'current_password': 'secret-42'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Job.objects.count(), 1)
+
+        client = APIClient()
+        self.assertEqual(
+            client.get(f'/api/users/{self.user.id}/').status_code, 404
+        )
+        self.assertEqual(client.get('/api/users/').json()['count'], 0)
+        response = client.post('/api/users/', {
+            'email': 'user@example.org',
+            'username': 'user',
+            'password': 'secret-42',
+            'first_name': 'Иван',
+            'last_name': 'Иванов',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,40 @@
+from foodgram.cascades import delete_in_chunks
+from jobs.queue import enqueue
+from users.models import User
+from users.tasks import delete_user
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей с большим количеством связанных данных: '
+        'подписки, избранное и списки покупок удаляются пачками, '
+        'чтобы не держать долгих блокировок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'users', nargs='+', help='email или id пользователей'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить удаление в очередь фоновых задач.',
+        )
+
+    def handle(self, *args, **options):
+        for lookup in options['users']:
+            field = 'pk' if lookup.isdigit() else 'email'
+            user = User.objects.filter(**{field: lookup}).first()
+            if user is None:
+                raise CommandError(f'Пользователь {lookup} не найден.')
+            if options['background']:
+                enqueue(delete_user, {
+                    'user_id': user.pk, 'chunk_size': options['chunk_size']
+                })
+                print(f'Удаление пользователя {lookup} в очереди.')
+                continue
+            delete_in_chunks(user, options['chunk_size'])
+            print(f'Пользователь {lookup} удалён.')
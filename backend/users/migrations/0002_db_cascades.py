@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-19 06:14
+
+import foodgram.cascades
+import users.models
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='profile',
+            managers=[
+                ('objects', users.models.ProfileManager()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='following',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='users', to=settings.AUTH_USER_MODEL, verbose_name='На кого подписан'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        # модели на момент миграции: DB_CASCADES дополняют и позже
+        migrations.RunPython(
+            foodgram.cascades.set_db_cascades('users', model_names=['follow']),
+            foodgram.cascades.set_db_cascades(
+                'users', enabled=False, model_names=['follow']
+            ),
+        ),
+    ]
@@ -1,12 +1,17 @@
 import foodgram.constants as var
+from foodgram.cascades import CascadeModel, CascadeQuerySet
 from foodgram.validators import validate_username
 
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
 
-class Profile(AbstractUser):
+class ProfileManager(UserManager.from_queryset(CascadeQuerySet)):
+    pass
+
+
+class Profile(CascadeModel, AbstractUser):
     email = models.EmailField(
         verbose_name='Email пользователя',
         max_length=var.USER_MAX_LEN_EMAIL,
@@ -25,6 +30,8 @@ class Profile(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'username', 'last_name', ]
 
+    objects = ProfileManager()
+
     class Meta:
         verbose_name = 'пользователь'
         verbose_name_plural = 'Пользователи'
@@ -37,15 +44,17 @@ User = get_user_model()
 
 
 class Follow(models.Model):
+    # ON DELETE CASCADE для обоих ключей выполняет СУБД,
+    # см. foodgram.cascades
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='subscriptions',
         verbose_name='Пользователь'
     )
     following = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='users',
         verbose_name='На кого подписан',
     )
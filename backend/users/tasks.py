@@ -0,0 +1,12 @@
+from foodgram.cascades import delete_in_chunks
+from jobs.queue import task
+from users.models import User
+
+
+@task
+def delete_user(user_id, chunk_size=1000):
+    """Удаляет пользователя и его данные пачками, см. delete_in_chunks."""
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        delete_in_chunks(user, chunk_size)
@@ -1,22 +1,23 @@
+from api.mixins import ReplicaReadMixin
 from api.permissions import AuthorStaffOrReadOnly
-from api.serializers import (
-    FollowAddSerializer,
-    FollowSerializer,
-    ProfileSerializer
-)
+from api.representations import FOLLOW, PROFILE, follows_data, profiles_data
+from api.serializers import FollowAddSerializer, ProfileSerializer
 from djoser.views import UserViewSet
+from jobs.queue import enqueue
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from users.models import Follow, User
+from users.tasks import delete_user
 
 from django.shortcuts import get_object_or_404
 
 
-class ProfileViewSet(UserViewSet):
+class ProfileViewSet(ReplicaReadMixin, UserViewSet):
     http_method_names = ['get', 'post', 'delete']
+    replica_actions = ('list', 'subscriptions')
     pagination_class = LimitOffsetPagination
     serializer_class = ProfileSerializer
 
@@ -27,23 +28,54 @@ class ProfileViewSet(UserViewSet):
             return (AuthorStaffOrReadOnly(),)
         return (AllowAny(),)
 
+    def get_queryset(self):
+        # пользователь, которого удаляет фоновая задача, уже не виден
+        return super().get_queryset().filter(is_active=True)
+
+    def perform_destroy(self, instance):
+        # у пользователя может быть много подписок, избранного и списков
+        # покупок: сразу запрещаем вход и освобождаем email и username,
+        # а данные удаляет фоновая задача (нужен manage.py run_workers)
+        instance.is_active = False
+        instance.email = f'deleted-{instance.pk}@deleted.invalid'
+        instance.username = f'deleted-{instance.pk}'
+        instance.save(update_fields=['is_active', 'email', 'username'])
+        enqueue(delete_user, {'user_id': instance.pk})
+
+    def list(self, request, *args, **kwargs):
+        representation = PROFILE.from_query(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *representation.columns
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                profiles_data(request, page, representation)
+            )
+        return Response(profiles_data(request, queryset, representation))
+
+    def retrieve(self, request, *args, **kwargs):
+        representation = PROFILE.from_query(request.query_params)
+        user = self.get_object()
+        row = {name: getattr(user, name) for name in representation.columns}
+        return Response(profiles_data(request, [row], representation)[0])
+
     @action(
         detail=False,
         methods=['get'],
     )
     def subscriptions(self, request):
         user = request.user
+        representation = FOLLOW.from_query(request.query_params)
         followings = Follow.objects.filter(user=user)
         queryset = User.objects.filter(
-            id__in=followings.values_list('following')
-        )
+            id__in=followings.values_list('following'), is_active=True
+        ).values(*representation.columns)
         pages = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(
-            pages,
-            many=True,
-            context={'request': request}
-        )
-        return self.get_paginated_response(serializer.data)
+        limit = request.GET.get('recipes_limit')
+        return self.get_paginated_response(follows_data(
+            pages, int(limit) if limit else None, representation
+        ))
 
     @action(
         detail=True,
@@ -51,7 +83,7 @@ class ProfileViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         # postman хочет 404, а сериализатор выдаст 400
-        get_object_or_404(User, id=id)
+        get_object_or_404(User, id=id, is_active=True)
         serializer = FollowAddSerializer(
             data={'user': request.user.id, 'following': id},
             context={"request": request}